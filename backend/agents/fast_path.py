@@ -0,0 +1,222 @@
+import re
+from sqlalchemy import and_, case, func, select, text
+from backend.models import Patient, PatientScheme, SchemeMapping
+from backend.versions import versions
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20,
+}
+FILLER_RE = re.compile(r"^(hey|hi|ok|okay|please|um+|uh+|so|agent|securehealth|can you|could you|tell me)\b\s*")
+OPEN_RE = re.compile(r"\b(why|explain|recommend|suggest|should|advice|analy[sz]e|summari[sz]e|compare|trend|predict|improve|plan)\b")
+WARD_BREAKDOWN_RE = re.compile(r"\b(which ward|by ward|per ward|each ward|ward wise|ward (breakdown|distribution|stats|statistics))\b")
+DISTRIBUTION_RE = re.compile(r"\b(risk (distribution|breakdown|buckets?|levels?)|distribution of risk)\b")
+TOP_RE = re.compile(r"\b(top|highest|riskiest|most at risk|most critical)\b")
+COUNT_RE = re.compile(r"\b(how many|number of|count|total)\b")
+AVERAGE_RE = re.compile(r"\b(average|avg|mean)\b")
+LIST_RE = re.compile(r"\b(which|list|show|who)\b")
+SCHEME_RE = re.compile(r"\b(schemes?|eligib\w*|qualif\w*)\b")
+RISK_LEVEL_RE = re.compile(r"\b(high|critical|medium|moderate|low) risk\b")
+NEGATION_RE = re.compile(r"\b(not|no|non|never|none|without|except|excluding|exclude\w*|other than|ineligible|isn|aren|don|doesn|didn|cannot|cant)\b")
+AGE_RE = re.compile(r"\b(age[ds]?|old|older|oldest|young|younger|youngest|years?|yrs?|elderly|adults?|child|children|teen\w*|over|under|above|below|between|than)\b")
+TIME_RE = re.compile(
+    r"\b(today|tonight|yesterday|tomorrow|days?|weeks?|weekly|months?|monthly|quarter|since|ago|last|past|recent\w*|new|newly"
+    r"|admitted|admissions?|discharged|registered|added|created|before|after|until|during|when|this)\b"
+)
+DOCTOR_RE = re.compile(r"\b(dr|doctors?|doc|physicians?|consultants?|nurses?|assigned|treated|treating|attending)\b")
+DIAGNOSIS_RE = re.compile(r"\b(diagnos\w*|suffer\w*|conditions?|diseases?|illness\w*|symptoms?|fever|infections?|disorders?)\b")
+QUALIFIERS = (NEGATION_RE, AGE_RE, TIME_RE, DOCTOR_RE, DIAGNOSIS_RE)
+TEMPLATE_WORDS = set("""
+    how many number of count total the a an all are is there do does i we me my our have has in on at for with
+    patient patients people risk score scores level levels bucket buckets high critical medium moderate low
+    top highest riskiest most average avg mean which list show who what s give get find display
+    ward wards by per each wise breakdown distribution stats statistics scheme schemes eligible eligibility
+    qualify qualifies qualified currently right now hospital please thanks
+""".split())
+BUCKETS = {
+    "high": (Patient.risk_score >= 0.65, "High-risk"),
+    "medium": (and_(Patient.risk_score >= 0.35, Patient.risk_score < 0.65), "Medium-risk"),
+    "low": (Patient.risk_score < 0.35, "Low-risk"),
+}
+LIST_LIMIT = 20
+WARD_WORDS = {"breakdown", "distribution", "wise", "stats", "statistics", "has", "with", "is", "by", "level", "the"}
+def _plain(text):
+    t = re.sub(r"[^\w\s]", " ", (text or "").lower().replace("-", " "))
+    return " ".join(str(NUMBER_WORDS.get(w, w)) for w in t.split())
+def normalize(question):
+    t = _plain(question)
+    previous = None
+    while previous != t:
+        previous = t
+        t = FILLER_RE.sub("", t)
+    return t
+def _scope_label(scope):
+    return "hospital-wide" if scope.role == "admin" else "in your scope"
+def _mentions(t, names):
+    return [n for n in names if re.search(rf"\b{re.escape(_plain(n))}\b", t)]
+def _risk_level(t):
+    m = RISK_LEVEL_RE.search(t)
+    if not m:
+        return None
+    level = m.group(1)
+    return {"critical": "high", "moderate": "medium"}.get(level, level)
+def _filtered(db, scope, cols, wards=(), level=None):
+    q = scope.apply(db.query(*cols))
+    if wards:
+        q = q.filter(Patient.ward.in_(wards))
+    if level:
+        q = q.filter(BUCKETS[level][0])
+    return q
+def _where(wards, level):
+    parts = []
+    if level:
+        parts.append(BUCKETS[level][1].lower())
+    if wards:
+        parts.append("in " + ", ".join(wards))
+    return " ".join(parts)
+def _table(headers, rows):
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(str(c) for c in r) + " |" for r in rows]
+    return "\n".join(lines)
+def _ward_breakdown(db, scope, t, wards):
+    rows = scope.apply(db.query(
+        Patient.ward,
+        func.count(Patient.id),
+        func.avg(Patient.risk_score),
+        func.sum(case((Patient.risk_score >= 0.65, 1), else_=0)),
+    )).group_by(Patient.ward).order_by(func.avg(Patient.risk_score).desc()).all()
+    if not rows:
+        return "ward_breakdown", "**Ward breakdown**\n\nNo patients are visible in your scope."
+    body = _table(["Ward", "Patients", "Avg risk", "High-risk"], [(w, n, f"{a:.2f}", h) for w, n, a, h in rows])
+    top = rows[0]
+    return "ward_breakdown", (
+        f"**Ward breakdown** ({_scope_label(scope)})\n\n{body}\n\n"
+        f"- **Highest average risk**: {top[0]} ({top[2]:.2f})"
+    )
+def _distribution(db, scope, t, wards):
+    total, low, medium, high = _filtered(db, scope, (
+        func.count(Patient.id),
+        func.sum(case((BUCKETS["low"][0], 1), else_=0)),
+        func.sum(case((BUCKETS["medium"][0], 1), else_=0)),
+        func.sum(case((BUCKETS["high"][0], 1), else_=0)),
+    ), wards).one()
+    where = f" in {', '.join(wards)}" if wards else ""
+    return "risk_distribution", (
+        f"**Risk distribution**{where} ({_scope_label(scope)})\n\n"
+        f"- **Low** (< 0.35): {low or 0}\n"
+        f"- **Medium** (0.35 - 0.65): {medium or 0}\n"
+        f"- **High** (>= 0.65): {high or 0}\n"
+        f"- **Total**: {total}"
+    )
+def _top(db, scope, t, wards):
+    m = re.search(r"\b(\d+)\b", t)
+    n = min(int(m.group(1)), 50) if m else 5
+    level = _risk_level(t)
+    cols = (Patient.id, Patient.age, Patient.ward, Patient.risk_score, Patient.diagnosis)
+    rows = _filtered(db, scope, cols, wards, level) \
+        .order_by(Patient.risk_score.desc(), Patient.id).limit(n).all()
+    if not rows:
+        return "top_risk", "**Highest-risk patients**\n\nNo patients are visible in your scope."
+    body = _table(
+        ["PID", "Age", "Ward", "Risk", "Diagnosis"],
+        [(pid, age, ward, f"{risk:.2f}", diag or "Unspecified") for pid, age, ward, risk, diag in rows],
+    )
+    title = f"{BUCKETS[level][1]} patients, top {len(rows)}" if level else f"Top {len(rows)} highest-risk patients"
+    where = f" in {', '.join(wards)}" if wards else ""
+    return "top_risk", f"**{title}**{where} ({_scope_label(scope)})\n\n{body}"
+def _schemes(db, scope, t, wards, names):
+    if names:
+        q = _filtered(db, scope, (Patient.id,), wards, _risk_level(t)).filter(
+            Patient.id.in_(select(PatientScheme.patient_id).where(PatientScheme.scheme_name.in_(names)))
+        )
+        count = q.count()
+        label = ", ".join(names)
+        text = f"**{label} eligibility** ({_scope_label(scope)})\n\n- **Eligible patients**: {count}"
+        if LIST_RE.search(t) and count:
+            pids = [pid for (pid,) in q.order_by(Patient.id).limit(LIST_LIMIT)]
+            more = f" (first {LIST_LIMIT} of {count})" if count > LIST_LIMIT else ""
+            text += f"\n- **PIDs**{more}: " + ", ".join(str(p) for p in pids)
+        return "scheme_eligibility", text
+    rows = scope.apply(
+        db.query(PatientScheme.scheme_name, func.count()).join(Patient, Patient.id == PatientScheme.patient_id)
+    )
+    if wards:
+        rows = rows.filter(Patient.ward.in_(wards))
+    rows = rows.group_by(PatientScheme.scheme_name).order_by(func.count().desc()).all()
+    if not rows:
+        return "scheme_eligibility", "**Scheme eligibility**\n\nNo scheme-eligible patients are visible in your scope."
+    return "scheme_eligibility", (
+        f"**Scheme eligibility** ({_scope_label(scope)})\n\n" + _table(["Scheme", "Eligible patients"], rows)
+    )
+def _count(db, scope, t, wards):
+    level = _risk_level(t)
+    total = _filtered(db, scope, (func.count(Patient.id),)).scalar()
+    count = _filtered(db, scope, (func.count(Patient.id),), wards, level).scalar()
+    where = _where(wards, level)
+    title = f"{BUCKETS[level][1]} patients" if level else "Patients"
+    lines = [f"**{title}**" + (f" in {', '.join(wards)}" if wards else "") + f" ({_scope_label(scope)})", ""]
+    lines.append(f"- **Count**: {count}" + (f" of {total} patients" if where else ""))
+    return "count", "\n".join(lines)
+def _average(db, scope, t, wards):
+    level = _risk_level(t)
+    count, avg = _filtered(db, scope, (func.count(Patient.id), func.avg(Patient.risk_score)), wards, level).one()
+    if not count:
+        return "average_risk", "**Average risk score**\n\nNo matching patients are visible in your scope."
+    where = _where(wards, level)
+    return "average_risk", (
+        "**Average risk score**" + (f", {where}" if where else "") + f" ({_scope_label(scope)})\n\n"
+        f"- **Average**: {avg:.3f}\n- **Patients**: {count}"
+    )
+def _consumed(t, phrases, numbers=False):
+    for p in sorted((_plain(p) for p in phrases), key=len, reverse=True):
+        t = re.sub(rf"\b{re.escape(p)}\b", " ", t)
+    return all(w in TEMPLATE_WORDS or (numbers and w.isdigit()) for w in t.split())
+def _intent(t, ward_hits, scheme_hits):
+    if WARD_BREAKDOWN_RE.search(t):
+        return _ward_breakdown, (ward_hits,), False
+    if DISTRIBUTION_RE.search(t):
+        return _distribution, (ward_hits,), False
+    if scheme_hits or (SCHEME_RE.search(t) and (COUNT_RE.search(t) or LIST_RE.search(t))):
+        return _schemes, (ward_hits, scheme_hits), False
+    if (TOP_RE.search(t) and "risk" in t) or (LIST_RE.search(t) and "patient" in t and _risk_level(t)):
+        return _top, (ward_hits,), True
+    if AVERAGE_RE.search(t) and "risk" in t:
+        return _average, (ward_hits,), False
+    if COUNT_RE.search(t) and "patient" in t:
+        return _count, (ward_hits,), False
+    return None
+def _distinct(db, col):
+    return [v for (v,) in db.execute(text(
+        f"WITH RECURSIVE v(x) AS (SELECT min({col}) FROM patients UNION ALL "
+        f"SELECT (SELECT min({col}) FROM patients WHERE {col} > x) FROM v WHERE x IS NOT NULL) "
+        "SELECT x FROM v WHERE x IS NOT NULL"
+    )) if v]
+_vocab = (None, (), ())
+def _vocabulary(db):
+    global _vocab
+    stamp = versions(db, "patients")
+    if _vocab[0] != stamp:
+        _vocab = (stamp, _distinct(db, "ward"), _distinct(db, "diagnosis"))
+    return _vocab[1], _vocab[2]
+def answer(db, scope, question):
+    t = normalize(question)
+    if not t or OPEN_RE.search(t) or any(r.search(t) for r in QUALIFIERS) or len(RISK_LEVEL_RE.findall(t)) > 1:
+        return None
+    wards, diagnoses = _vocabulary(db)
+    ward_hits = _mentions(t, wards)
+    if ward_hits and scope.clause() is not None:
+        visible = {w for (w,) in scope.apply(db.query(Patient.ward).filter(Patient.ward.in_(ward_hits))).distinct()}
+        if any(w not in visible for w in ward_hits):
+            return None
+    named = {_plain(w) for w in ward_hits}
+    if any(f"ward {m}" not in named for m in re.findall(r"\bward (\w+)", t) if m not in WARD_WORDS):
+        return None
+    if _mentions(t, diagnoses):
+        return None
+    scheme_hits = _mentions(t, [n for (n,) in db.query(SchemeMapping.scheme_name).distinct() if n])
+    matched = _intent(t, ward_hits, scheme_hits)
+    if matched is None:
+        return None
+    handler, args, numbers = matched
+    if not _consumed(t, ward_hits + scheme_hits, numbers):
+        return None
+    return handler(db, scope, t, *args)
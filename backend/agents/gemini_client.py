@@ -1,37 +1,66 @@
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import PromptTemplate
-from backend.config import GEMINI_API_KEY
-if GEMINI_API_KEY:
-    os.environ["GOOGLE_API_KEY"] = GEMINI_API_KEY
-import google.generativeai as genai
-_llm = None
-if GEMINI_API_KEY:
+import json
+import time
+import asyncio
+from backend.config import GEMINI_API_KEY, LLM_MODEL, LLM_MODEL_CACHE, LLM_MODEL_CACHE_TTL
+from backend.agents.llm_client import LLMUnavailable
+CANDIDATES = ["models/gemini-2.5-flash", "models/gemini-2.0-flash", "models/gemini-1.5-flash", "models/gemini-1.5-flash-latest", "models/gemini-pro"]
+FALLBACK_MODEL = "gemini-1.5-flash"
+def _cached_models(path=LLM_MODEL_CACHE, ttl=LLM_MODEL_CACHE_TTL):
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        models = [m.name for m in genai.list_models() if "generateContent" in m.supported_generation_methods]
-        target_model = "gemini-1.5-flash"
-        for candidate in ["models/gemini-2.5-flash", "models/gemini-2.0-flash", "models/gemini-1.5-flash", "models/gemini-1.5-flash-latest", "models/gemini-pro"]:
-            if candidate in models:
-                target_model = candidate.split("/")[-1]
-                break
-        _llm = ChatGoogleGenerativeAI(model=target_model, temperature=0)
-    except Exception as e:
-        print(f"Failed to auto-detect model: {e}")
-        _llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0)
-def ask_gemini(system_prompt, context_text, user_question):
-    if not _llm:
-        return "GEMINI_API_KEY is not configured in environment variables."
-    prompt = PromptTemplate.from_template(
-        "{system_prompt}\n\nContext Data:\n{context_text}\n\nQuestion: {user_question}"
-    )
-    chain = prompt | _llm
-    try:
-        resp = chain.invoke({
-            "system_prompt": system_prompt,
-            "context_text": context_text,
-            "user_question": user_question
-        })
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - data.get("fetched_at", 0) > ttl:
+        return None
+    return data.get("models")
+def _store_models(models, path=LLM_MODEL_CACHE):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fetched_at": time.time(), "models": models}, f)
+    os.replace(tmp, path)
+def discover_model(genai):
+    models = _cached_models()
+    if models is None:
+        try:
+            models = [m.name for m in genai.list_models() if "generateContent" in m.supported_generation_methods]
+        except Exception as e:
+            print(f"Failed to auto-detect model: {e}")
+            return FALLBACK_MODEL
+        _store_models(models)
+    for candidate in CANDIDATES:
+        if candidate in models:
+            return candidate.split("/")[-1]
+    return FALLBACK_MODEL
+class GeminiBackend:
+    name = "gemini"
+    def __init__(self, api_key=GEMINI_API_KEY, model=LLM_MODEL):
+        self.api_key = api_key
+        self.model = model
+        self._llm = None
+        self._lock = None
+    def _init(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        import google.generativeai as genai
+        os.environ["GOOGLE_API_KEY"] = self.api_key
+        genai.configure(api_key=self.api_key)
+        self.model = self.model or discover_model(genai)
+        return ChatGoogleGenerativeAI(model=self.model, temperature=0)
+    async def _ready(self):
+        if self._llm is not None:
+            return self._llm
+        if not self.api_key:
+            raise LLMUnavailable("GEMINI_API_KEY is not configured in environment variables.")
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._llm is None:
+                self._llm = await asyncio.to_thread(self._init)
+        return self._llm
+    async def complete(self, prompt):
+        resp = await (await self._ready()).ainvoke(prompt)
         return resp.content.strip()
-    except Exception as e:
-        return f"query failed via langchain: {str(e)}"
+    async def stream(self, prompt):
+        async for chunk in (await self._ready()).astream(prompt):
+            yield chunk.content
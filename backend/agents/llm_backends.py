@@ -0,0 +1,68 @@
+import re
+import asyncio
+import hashlib
+import httpx
+from backend.config import LLM_BACKEND, LLM_ENDPOINT, STUB_LLM_TOKEN_MS
+from backend.agents.llm_client import LLMClient
+class HTTPBackend:
+    name = "http"
+    def __init__(self, endpoint=LLM_ENDPOINT):
+        self.endpoint = endpoint
+        self._http = None
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http[0] is not loop:
+            self._http = (loop, httpx.AsyncClient())
+        return self._http[1]
+    async def complete(self, prompt):
+        r = await self._client().post(self.endpoint, json={"prompt": prompt})
+        r.raise_for_status()
+        return r.json()["text"].strip()
+    async def stream(self, prompt):
+        async with self._client().stream("POST", self.endpoint, json={"prompt": prompt, "stream": True}) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_text():
+                yield chunk
+class StubBackend:
+    name = "stub"
+    def __init__(self, token_ms=STUB_LLM_TOKEN_MS):
+        self.delay = token_ms / 1000
+    def answer(self, prompt):
+        summary = dict(re.findall(r"(\w+)=(\S+)", prompt.split("## summary", 1)[-1].split("\n## ", 1)[0].split("\n\n", 1)[0]))
+        question = prompt.rsplit("Question:", 1)[-1].strip()
+        sections = re.findall(r"^## (\w+)", prompt, re.M)
+        digest = hashlib.sha1(prompt.encode()).hexdigest()[:8]
+        lines = [
+            "**Offline stub answer**",
+            "",
+            f"- **Question**: {question}",
+            f"- **Patients in scope**: {summary.get('total_patients', 'n/a')}",
+            f"- **High-risk patients**: {summary.get('high_risk', 'n/a')}",
+            f"- **Average risk**: {summary.get('avg_hospital_risk', 'n/a')}",
+            f"- **Context sections**: {', '.join(sections) or 'none'}",
+            f"- **Prompt digest**: `{digest}`",
+        ]
+        return "\n".join(lines)
+    async def complete(self, prompt):
+        text = self.answer(prompt)
+        if self.delay:
+            await asyncio.sleep(self.delay * len(text.split()))
+        return text
+    async def stream(self, prompt):
+        for token in re.findall(r"\S+\s*", self.answer(prompt)):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield token
+def load_backend(name=LLM_BACKEND):
+    if name == "gemini":
+        from backend.agents.gemini_client import GeminiBackend
+        return GeminiBackend()
+    if name == "http":
+        return HTTPBackend()
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"unknown LLM_BACKEND {name!r}")
+def make_client(backend=None):
+    backend = backend or load_backend()
+    return LLMClient(backend.complete, backend.stream)
+client = make_client()
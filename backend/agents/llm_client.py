@@ -0,0 +1,126 @@
+import random
+import asyncio
+import hashlib
+import httpx
+from backend.config import LLM_TIMEOUT, LLM_CONCURRENCY, LLM_RETRIES, LLM_BACKOFF_MS
+PROMPT = "{system_prompt}\n\nContext Data:\n{context_text}\n\nQuestion: {user_question}"
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+class LLMError(Exception):
+    pass
+class LLMUnavailable(LLMError):
+    pass
+def _transient(e):
+    if isinstance(e, (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return (status if status is not None else getattr(e, "code", None)) in RETRY_STATUS
+def _failure(e):
+    return LLMError(f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+class LLMClient:
+    def __init__(self, complete, stream=None, timeout=LLM_TIMEOUT, concurrency=LLM_CONCURRENCY, retries=LLM_RETRIES, backoff_ms=LLM_BACKOFF_MS):
+        self.complete = complete
+        self.stream_fn = stream
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff_ms / 1000
+        self._loop = None
+        self._sem = None
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._inflight = {}
+        return loop
+    async def generate(self, prompt, timeout=None):
+        loop = self._bind()
+        key = hashlib.sha1(prompt.encode()).hexdigest()
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        fut = loop.create_future()
+        self._inflight[key] = fut
+        try:
+            result = await self._call(prompt, timeout or self.timeout)
+        except BaseException as e:
+            fut.set_exception(e if isinstance(e, Exception) else LLMError("cancelled"))
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    async def _call(self, prompt, timeout):
+        deadline = self._loop.time() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                raise LLMError(f"deadline of {timeout}s exceeded")
+            try:
+                await asyncio.wait_for(self._sem.acquire(), remaining)
+                try:
+                    self.calls += 1
+                    return await asyncio.wait_for(self.complete(prompt), max(0.0, deadline - self._loop.time()))
+                finally:
+                    self._sem.release()
+            except LLMError:
+                raise
+            except Exception as e:
+                attempt += 1
+                if not _transient(e) or attempt > self.retries or self._loop.time() >= deadline:
+                    raise _failure(e) from e
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(min(delay, max(0.0, deadline - self._loop.time())))
+    async def ask(self, system_prompt, context_text, user_question, timeout=None):
+        prompt = PROMPT.format(system_prompt=system_prompt, context_text=context_text, user_question=user_question)
+        return await self.generate(prompt, timeout)
+    async def stream(self, prompt, timeout=None):
+        loop = self._bind()
+        timeout = timeout or self.timeout
+        if self.stream_fn is None:
+            yield await self.generate(prompt, timeout)
+            return
+        deadline = loop.time() + timeout
+        attempt = 0
+        while True:
+            sent = False
+            try:
+                await asyncio.wait_for(self._sem.acquire(), max(0.0, deadline - loop.time()))
+                try:
+                    self.calls += 1
+                    agen = self.stream_fn(prompt)
+                    try:
+                        while True:
+                            remaining = deadline - loop.time()
+                            if remaining <= 0:
+                                raise asyncio.TimeoutError()
+                            try:
+                                chunk = await asyncio.wait_for(agen.__anext__(), remaining)
+                            except StopAsyncIteration:
+                                return
+                            if chunk:
+                                sent = True
+                                yield chunk
+                    finally:
+                        await agen.aclose()
+                finally:
+                    self._sem.release()
+            except LLMError:
+                raise
+            except Exception as e:
+                attempt += 1
+                if sent or not _transient(e) or attempt > self.retries or loop.time() >= deadline:
+                    raise _failure(e) from e
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(min(delay, max(0.0, deadline - loop.time())))
+    async def ask_stream(self, system_prompt, context_text, user_question, timeout=None):
+        prompt = PROMPT.format(system_prompt=system_prompt, context_text=context_text, user_question=user_question)
+        async for chunk in self.stream(prompt, timeout):
+            yield chunk
@@ -1,55 +1,215 @@
-import json
+import re
+import time
+import asyncio
+import logging
 from datetime import datetime
-from backend.models import Patient, AgentCommand
-from backend.agents.gemini_client import ask_gemini
-def build_context(db, requesting_user):
-    pq = db.query(Patient)
-    if requesting_user.role == "doctor":
-        pq = pq.filter(Patient.assigned_doctor_id == requesting_user.id)
-    elif requesting_user.role == "nurse":
-        if requesting_user.department:
-            pq = pq.filter(Patient.ward == requesting_user.department)
-    patients = pq.all()
-    patient_list = []
-    for p in patients:
-        patient_list.append({
-            "pid": p.id,
-            "age": p.age,
-            "ward": p.ward,
-            "risk": p.risk_score,
-            "diagnosis": p.diagnosis or "Unspecified",
-            "schemes": json.loads(p.scheme_eligible) if p.scheme_eligible else []
-        })
-    staff_metrics = []
-    if requesting_user.role == "admin":
-        docs = db.query(User).filter(User.role == "doctor").all()
-        for d in docs:
-            d_patients = [p for p in patients if p.assigned_doctor_id == d.id]
-            staff_metrics.append({
-                "doctor_name": d.name,
-                "specialization": d.specialization,
-                "patient_count": len(d_patients),
-                "avg_risk": round(sum(p.risk_score for p in d_patients)/len(d_patients), 2) if d_patients else 0,
-                "alerts_triggered": len(d.alerts)
-            })
-    total = len(patients)
-    avg_risk = round(sum(p.risk_score for p in patients) / total, 3) if total > 0 else 0
+from sqlalchemy import and_, case, func, select
+from backend.models import Alert, AgentCommand, Patient, PatientScheme, SchemeMapping, User
+from backend.config import PQ_MAX_ROWS, PQ_CACHE_SIZE, PQ_CACHE_TTL
+from backend.cache import TTLCache
+from backend.database import AsyncSessionLocal
+from backend.scope import key_covers, scope_service
+from backend.versions import scope_versions, versions
+from backend.agents.llm_backends import client as llm
+from backend.agents.llm_client import LLMError, LLMUnavailable
+from backend.agents import fast_path
+logger = logging.getLogger(__name__)
+PID_RE = re.compile(r"\b(?:pid|patient|id)\s*#?\s*(\d+)\b", re.I)
+LIST_RE = re.compile(r"\b(which|list|show|who|names?|oldest|youngest|highest|lowest|top|eligible)\b", re.I)
+WARD_RE = re.compile(r"\b(wards?|units?|departments?)\b", re.I)
+STAFF_RE = re.compile(r"\b(doctors?|staff|physicians?|workload|colleagues?|dr)\b", re.I)
+SCHEME_RE = re.compile(r"\b(schemes?|eligib\w*|benefits?)\b", re.I)
+HIGH_RE = re.compile(r"\b(high[- ]risk|critical)\b", re.I)
+LOW_RE = re.compile(r"\blow[- ]risk\b", re.I)
+ANSWER_TABLES = ("patients", "patient_schemes", "users", "alerts")
+class Plan:
+    __slots__ = ("intents", "pids", "wards", "schemes", "risk")
+    def __init__(self, intents, pids=(), wards=(), schemes=(), risk=None):
+        self.intents = intents
+        self.pids = list(pids)
+        self.wards = list(wards)
+        self.schemes = list(schemes)
+        self.risk = risk
+def plan_question(question, role, wards=(), scheme_names=()):
+    q = question or ""
+    lower = q.lower()
+    pids = [int(x) for x in PID_RE.findall(q)]
+    ward_hits = [w for w in wards if w and w.lower() in lower]
+    scheme_hits = [n for n in scheme_names if n and n.lower() in lower]
+    risk = "high" if HIGH_RE.search(q) else "low" if LOW_RE.search(q) else None
+    intents = []
+    if pids or LIST_RE.search(q):
+        intents.append("patient_lookup")
+    if (WARD_RE.search(q) and not ward_hits) or len(ward_hits) > 1:
+        intents.append("ward_comparison")
+    if role == "admin" and STAFF_RE.search(q):
+        intents.append("staff_comparison")
+    if not intents or SCHEME_RE.search(q) or scheme_hits:
+        intents.append("aggregate")
+    return Plan(intents, pids, ward_hits, scheme_hits, risk)
+def _risk_filter(q, risk):
+    if risk == "high":
+        return q.filter(Patient.risk_score >= 0.65)
+    if risk == "low":
+        return q.filter(Patient.risk_score < 0.35)
+    return q
+def _patients_table(db, scope, plan):
+    q = scope.apply(db.query(
+        Patient.id, Patient.age, Patient.ward, Patient.risk_score, Patient.diagnosis,
+    ))
+    if plan.pids:
+        q = q.filter(Patient.id.in_(plan.pids))
+    else:
+        if plan.wards:
+            q = q.filter(Patient.ward.in_(plan.wards))
+        if plan.schemes:
+            q = q.filter(Patient.id.in_(
+                select(PatientScheme.patient_id).where(PatientScheme.scheme_name.in_(plan.schemes))
+            ))
+        q = _risk_filter(q, plan.risk)
+    matched = q.count()
+    rows = q.order_by(Patient.risk_score.desc(), Patient.id).limit(PQ_MAX_ROWS).all()
+    names = {}
+    if rows:
+        for pid, name in (
+            db.query(PatientScheme.patient_id, PatientScheme.scheme_name)
+            .filter(PatientScheme.patient_id.in_([r[0] for r in rows]))
+            .order_by(PatientScheme.scheme_name)
+        ):
+            names.setdefault(pid, []).append(name)
+    table = [
+        {
+            "pid": pid,
+            "age": age,
+            "ward": ward,
+            "risk": risk,
+            "diagnosis": diagnosis or "Unspecified",
+            "schemes": names.get(pid, []),
+        }
+        for pid, age, ward, risk, diagnosis in rows
+    ]
+    return table, matched
+def _staff_metrics(db):
+    alert_count = (
+        select(func.count(Alert.id)).where(Alert.user_id == User.id).correlate(User).scalar_subquery()
+    )
+    rows = (
+        db.query(
+            User.name,
+            User.specialization,
+            func.count(Patient.id),
+            func.avg(Patient.risk_score),
+            alert_count,
+        )
+        .outerjoin(Patient, Patient.assigned_doctor_id == User.id)
+        .filter(User.role == "doctor")
+        .group_by(User.id)
+        .order_by(User.id)
+    )
+    return [
+        {
+            "doctor_name": name,
+            "specialization": spec,
+            "patient_count": count,
+            "avg_risk": round(avg, 2) if avg is not None else 0,
+            "alerts_triggered": alerts,
+        }
+        for name, spec, count, avg, alerts in rows
+    ]
+def _ward_stats(db, scope):
+    rows = scope.apply(db.query(
+        Patient.ward,
+        func.count(Patient.id),
+        func.avg(Patient.risk_score),
+        func.sum(case((Patient.risk_score >= 0.65, 1), else_=0)),
+    )).group_by(Patient.ward).order_by(Patient.ward)
+    return [
+        {"ward": ward, "patients": count, "avg_risk": round(avg, 3), "high_risk": high}
+        for ward, count, avg, high in rows
+    ]
+def _summary(db, scope):
+    total, avg_risk, low, medium, high = scope.apply(db.query(
+        func.count(Patient.id),
+        func.avg(Patient.risk_score),
+        func.sum(case((Patient.risk_score < 0.35, 1), else_=0)),
+        func.sum(case((and_(Patient.risk_score >= 0.35, Patient.risk_score < 0.65), 1), else_=0)),
+        func.sum(case((Patient.risk_score >= 0.65, 1), else_=0)),
+    )).one()
     return {
-        "summary": {
-            "total_patients": total,
-            "avg_hospital_risk": avg_risk,
-        },
-        "patients_table": patient_list,
-        "staff_performance": staff_metrics
+        "total_patients": total,
+        "avg_hospital_risk": round(avg_risk, 3) if total else 0,
+        "low_risk": low or 0,
+        "medium_risk": medium or 0,
+        "high_risk": high or 0,
     }
-def ask(db, question, requesting_user):
-    ctx = build_context(db, requesting_user)
-    ctx_text = json.dumps(ctx, indent=2)
-    sys_prompt = (
+def _scheme_counts(db, scope):
+    rows = scope.apply(
+        db.query(PatientScheme.scheme_name, func.count()).join(Patient, Patient.id == PatientScheme.patient_id)
+    ).group_by(PatientScheme.scheme_name).order_by(PatientScheme.scheme_name)
+    return [{"scheme": name, "patients": count} for name, count in rows]
+def build_context(db, requesting_user, question=None):
+    scope = scope_service.for_user(db, requesting_user)
+    ward_stats = _ward_stats(db, scope)
+    scheme_names = [n for (n,) in db.query(SchemeMapping.scheme_name).distinct()]
+    plan = plan_question(question, requesting_user.role, [w["ward"] for w in ward_stats], scheme_names)
+    ctx = {"summary": _summary(db, scope)}
+    if "ward_comparison" in plan.intents or plan.intents == ["aggregate"]:
+        ctx["ward_stats"] = ward_stats
+    if "aggregate" in plan.intents and (plan.schemes or SCHEME_RE.search(question or "")):
+        ctx["scheme_counts"] = _scheme_counts(db, scope)
+    if "patient_lookup" in plan.intents:
+        ctx["patients_table"], matched = _patients_table(db, scope, plan)
+        ctx["summary"]["patients_matched"] = matched
+    if "staff_comparison" in plan.intents:
+        ctx["staff_performance"] = _staff_metrics(db)
+    return ctx, plan
+def _cell(v):
+    if isinstance(v, (list, tuple)):
+        return ";".join(str(x) for x in v) or "-"
+    if v is None:
+        return "-"
+    return str(v).replace("|", "/")
+def encode_context(ctx):
+    out = []
+    for name, value in ctx.items():
+        if isinstance(value, dict):
+            out.append(f"## {name}\n" + " ".join(f"{k}={_cell(v)}" for k, v in value.items()))
+        elif value:
+            cols = list(value[0])
+            lines = ["|".join(cols)] + ["|".join(_cell(row[c]) for c in cols) for row in value]
+            out.append(f"## {name}\n" + "\n".join(lines))
+        else:
+            out.append(f"## {name}\n(none)")
+    return "\n".join(out)
+def approx_tokens(text):
+    return (len(text) + 3) // 4
+_answers = TTLCache(maxsize=PQ_CACHE_SIZE, ttl=PQ_CACHE_TTL)
+_fast_stats = {"asked": 0, "fast": 0}
+def fast_path_ratio():
+    return round(_fast_stats["fast"] / _fast_stats["asked"], 3) if _fast_stats["asked"] else 0.0
+@scope_service.on_patient_change
+def _invalidate_answers(states):
+    if states is None:
+        _answers.clear()
+    else:
+        _answers.discard_where(lambda key: any(key_covers(key[0], ward, doc) for ward, doc in states))
+def normalize_question(question):
+    return " ".join(re.findall(r"\w+", (question or "").lower()))
+def _answer_key(db, requesting_user, question):
+    scope = scope_service.for_user(db, requesting_user)
+    if scope.role == "admin":
+        stamp = versions(db, *ANSWER_TABLES)
+    else:
+        stamp = scope_versions(db, scope.version_names())
+    return (scope.key, normalize_question(question), stamp)
+def system_prompt(role):
+    return (
         "You are the 'SecureHealth AI Intelligence Agent'. You are analyzing medical data.\n"
-        f"**IMPORTANT CONTEXT**: You are speaking to a {requesting_user.role}. "
+        f"**IMPORTANT CONTEXT**: You are speaking to a {role}. "
         "The data provided to you is ALREADY strictly filtered. It ONLY contains data "
-        "they are authorized to see (e.g. only their own assigned patients and wards).\n\n"
+        "they are authorized to see (e.g. only their own assigned patients and wards).\n"
+        "The context is a set of '## section' blocks: key=value pairs, or pipe-separated tables whose first "
+        "line is the column header (lists are ';'-separated). Sections not relevant to the question are omitted.\n\n"
         "**STRICT RULES FOR YOUR RESPONSE:**\n"
         "1. **Never reveal patient names** (use the provided PID).\n"
         "2. **Acknowledge Scope**: If they ask about 'the hospital' or 'other doctors', remind them "
@@ -58,21 +218,143 @@ def ask(db, question, requesting_user):
         "Use Markdown extensively (bold headers, bulleted lists, line breaks). Do not write walls of text.\n"
         "4. **Data-Driven**: If someone asks for specific risk (e.g., 'patient 55'), check 'patients_table'. "
         "If a data point isn't in the provided context, state clearly 'I do not have access to that data in your current scope.'\n"
+        "Use 'summary' and 'ward_stats' for counts and averages.\n"
         "5. **Admin Access**: (If provided) Use 'staff_performance' to compare doctors or identify high-workload areas."
     )
-    reply = ask_gemini(sys_prompt, ctx_text, question)
-    db.add(AgentCommand(
-        issued_by=requesting_user.id,
-        agent="privacy_query",
-        command_text=question,
-        result_summary=reply[:300] + "..." if len(reply) > 300 else reply,
-    ))
-    db.commit()
-    return {
-        "answer": reply,
-        "timestamp": datetime.utcnow().isoformat(),
-        "meta": {
-            "records_analyzed": len(ctx["patients_table"]),
-            "role": requesting_user.role
+class Query:
+    def __init__(self, db, question, requesting_user):
+        self.started = time.perf_counter()
+        self.question = question
+        self.user_id = requesting_user.id
+        self.role = requesting_user.role
+        scope = scope_service.for_user(db, requesting_user)
+        self.fast = fast_path.answer(db, scope, question)
+        _fast_stats["asked"] += 1
+        self.hit = None
+        if self.fast is not None:
+            _fast_stats["fast"] += 1
+            self.records = len(scope.patient_ids) if scope.patient_ids is not None else None
+            return
+        self.key = _answer_key(db, requesting_user, question)
+        self.hit = _answers.get(self.key)
+        if self.hit is None:
+            self.ctx, self.plan = build_context(db, requesting_user, question)
+            self.ctx_text = encode_context(self.ctx)
+            self.sys_prompt = system_prompt(self.role)
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.started) * 1000)
+    def _record(self, db, reply):
+        db.add(AgentCommand(
+            issued_by=self.user_id,
+            agent="privacy_query",
+            command_text=self.question,
+            result_summary=reply[:300] + "..." if len(reply) > 300 else reply,
+        ))
+        db.commit()
+    def direct(self, db):
+        intent, reply = self.fast
+        latency_ms = self.elapsed_ms()
+        logger.info(
+            "privacy_query user=%s fast_path=%s latency_ms=%s hit_ratio=%s",
+            self.user_id, intent, latency_ms, fast_path_ratio(),
+        )
+        self._record(db, reply)
+        if self.records is None:
+            self.records = db.query(func.count(Patient.id)).scalar()
+        return {
+            "answer": reply,
+            "timestamp": datetime.utcnow().isoformat(),
+            "meta": {
+                "records_analyzed": self.records,
+                "role": self.role,
+                "intents": [intent],
+                "source": "sql",
+                "prompt_tokens": 0,
+                "latency_ms": latency_ms,
+                "cached": False,
+                "fast_path_hit_ratio": fast_path_ratio(),
+            },
         }
-    }
+    def cached(self, db):
+        self._record(db, self.hit["answer"])
+        return {
+            "answer": self.hit["answer"],
+            "timestamp": datetime.utcnow().isoformat(),
+            "meta": {
+                **self.hit["meta"],
+                "source": "cache",
+                "cached": True,
+                "latency_ms": self.elapsed_ms(),
+                "fast_path_hit_ratio": fast_path_ratio(),
+            },
+        }
+    def finish(self, db, reply, ok):
+        latency_ms = self.elapsed_ms()
+        prompt_tokens = approx_tokens(self.sys_prompt) + approx_tokens(self.ctx_text) + approx_tokens(self.question)
+        logger.info(
+            "privacy_query user=%s intents=%s context_tokens~%s prompt_tokens~%s reply_tokens~%s latency_ms=%s",
+            self.user_id, ",".join(self.plan.intents), approx_tokens(self.ctx_text), prompt_tokens,
+            approx_tokens(reply), latency_ms,
+        )
+        self._record(db, reply)
+        meta = {
+            "records_analyzed": self.ctx["summary"]["total_patients"],
+            "role": self.role,
+            "intents": self.plan.intents,
+            "source": "llm",
+            "prompt_tokens": prompt_tokens,
+            "latency_ms": latency_ms,
+            "cached": False,
+        }
+        if ok:
+            _answers.set(self.key, {"answer": reply, "meta": meta})
+        meta = {**meta, "fast_path_hit_ratio": fast_path_ratio()}
+        return {
+            "answer": reply,
+            "timestamp": datetime.utcnow().isoformat(),
+            "meta": meta,
+        }
+def _failure(e):
+    return str(e) if isinstance(e, LLMUnavailable) else f"query failed: {e}"
+async def _write(fn, *args):
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(fn, *args)
+async def prepare(db, question, requesting_user):
+    q = await db.run_sync(Query, question, requesting_user)
+    await db.rollback()  # release the read connection while the LLM works
+    return q
+async def ask(db, question, requesting_user):
+    q = await prepare(db, question, requesting_user)
+    if q.fast is not None:
+        return await _write(q.direct)
+    if q.hit is not None:
+        return await _write(q.cached)
+    try:
+        reply = await llm.ask(q.sys_prompt, q.ctx_text, question)
+        ok = bool(reply)
+    except LLMError as e:
+        reply, ok = _failure(e), False
+    return await _write(q.finish, reply, ok)
+async def ask_stream(q):
+    if q.fast is not None or q.hit is not None:
+        result = await _write(q.direct if q.fast is not None else q.cached)
+        yield "token", {"text": result["answer"]}
+        yield "done", result
+        return
+    parts = []
+    ok = False
+    tokens = llm.ask_stream(q.sys_prompt, q.ctx_text, q.question)
+    try:
+        async for chunk in tokens:
+            parts.append(chunk)
+            yield "token", {"text": chunk}
+        ok = bool(parts)
+    except LLMError as e:
+        parts = [_failure(e)]
+        yield "error", {"detail": parts[0]}
+    except BaseException:
+        await asyncio.shield(_write(q.finish, "".join(parts) + " [cancelled by client]", False))
+        raise
+    finally:
+        await tokens.aclose()
+    yield "done", await _write(q.finish, "".join(parts), ok)
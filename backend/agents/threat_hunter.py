@@ -1,9 +1,13 @@
 import re
 import json
+import asyncio
 from datetime import datetime, timedelta
 import pandas as pd
+from backend.database import AsyncSessionLocal
 from backend.models import AccessLog, Alert, AgentCommand, User, Patient
 from backend.ml.predictor import score_users
+from backend.log_archive import read_archived
+from backend.principals import principals
 from backend.config import ANOMALY_MEDIUM, ANOMALY_HIGH, ANOMALY_CRITICAL
 def parse_voice_command(transcript):
     txt = transcript.lower().strip()
@@ -42,9 +46,11 @@ def _safe_dict(h):
         else:
             out[k] = v
     return out
-async def scan(db, ward_filter=None, user_name_filter=None, triggered_by_id=None, ws_manager=None):
+LOG_FIELDS = ("user_id", "patient_id", "action", "resource", "ip_address", "timestamp", "flagged")
+def _window(db, ward_filter, user_name_filter):
     cutoff = datetime.utcnow() - timedelta(hours=2)
     q = db.query(AccessLog).filter(AccessLog.timestamp >= cutoff)
+    pid_list = uid_list = None
     if ward_filter:
         pid_list = [
             p.id for p in db.query(Patient).filter(Patient.ward.ilike(f"%{ward_filter}%")).all()
@@ -55,8 +61,22 @@ async def scan(db, ward_filter=None, user_name_filter=None, triggered_by_id=None
             u.id for u in db.query(User).filter(User.name.ilike(f"%{user_name_filter}%")).all()
         ]
         q = q.filter(AccessLog.user_id.in_(uid_list)) if uid_list else q.filter(AccessLog.id == -1)
-    log_rows = q.all()
-    if not log_rows:
+    log_rows = [{k: getattr(r, k) for k in LOG_FIELDS} for r in q]
+    log_rows += [
+        {k: r.get(k) for k in LOG_FIELDS} for r in read_archived(
+            from_dt=cutoff,
+            patient_ids=set(pid_list) if pid_list is not None else None,
+            user_ids=set(uid_list) if uid_list is not None else None,
+        )
+    ]
+    users = [{"id": u.id, "role": u.role, "department": u.department, "name": u.name} for u in db.query(User)]
+    return log_rows, users
+def _score(log_rows, users):
+    logs_df = pd.DataFrame(log_rows, columns=LOG_FIELDS)
+    users_df = pd.DataFrame([{k: u[k] for k in ("id", "role", "department")} for u in users])
+    return score_users(logs_df, users_df)
+def _record(db, hits, logs_scanned, users, ward_filter, user_name_filter, triggered_by_id):
+    if not logs_scanned:
         note = "no logs in scan window"
         db.add(AgentCommand(
             issued_by=triggered_by_id,
@@ -65,26 +85,11 @@ async def scan(db, ward_filter=None, user_name_filter=None, triggered_by_id=None
             result_summary=note,
         ))
         db.commit()
-        return {"alerts_created": 0, "users_locked": 0, "logs_scanned": 0, "summary": note}
-    all_users = db.query(User).all()
-    logs_df = pd.DataFrame([{
-        "user_id": r.user_id,
-        "patient_id": r.patient_id,
-        "action": r.action,
-        "resource": r.resource,
-        "ip_address": r.ip_address,
-        "timestamp": r.timestamp,
-        "flagged": r.flagged,
-    } for r in log_rows])
-    users_df = pd.DataFrame([{
-        "id": u.id,
-        "role": u.role,
-        "department": u.department,
-    } for u in all_users])
-    hits = score_users(logs_df, users_df)
+        return {"alerts_created": 0, "users_locked": 0, "logs_scanned": 0, "summary": note}, []
     alerts_created = 0
     locked_count = 0
-    user_name_map = {u.id: u.name for u in all_users}
+    user_name_map = {u["id"]: u["name"] for u in users}
+    events = []
     for h in hits:
         score = h["anomaly_score"]
         if score < ANOMALY_MEDIUM:
@@ -111,18 +116,17 @@ async def scan(db, ward_filter=None, user_name_filter=None, triggered_by_id=None
         db.add(alert)
         db.flush()
         alerts_created += 1
-        if ws_manager:
-            await ws_manager.broadcast({
-                "event": "new_alert",
-                "alert_id": alert.id,
-                "user_id": uid,
-                "user_name": uname,
-                "severity": sev,
-                "anomaly_score": score,
-                "auto_locked": auto_lock,
-                "created_at": alert.created_at.isoformat(),
-            })
-    summary = f"scanned {len(log_rows)} logs; {alerts_created} alerts; {locked_count} locked"
+        events.append({
+            "event": "new_alert",
+            "alert_id": alert.id,
+            "user_id": uid,
+            "user_name": uname,
+            "severity": sev,
+            "anomaly_score": score,
+            "auto_locked": auto_lock,
+            "created_at": alert.created_at.isoformat(),
+        })
+    summary = f"scanned {logs_scanned} logs; {alerts_created} alerts; {locked_count} locked"
     db.add(AgentCommand(
         issued_by=triggered_by_id,
         agent="threat_hunter",
@@ -130,18 +134,29 @@ async def scan(db, ward_filter=None, user_name_filter=None, triggered_by_id=None
         result_summary=summary,
     ))
     db.commit()
+    if locked_count:
+        principals.invalidate()
     return {
         "alerts_created": alerts_created,
         "users_locked": locked_count,
-        "logs_scanned": len(log_rows),
+        "logs_scanned": logs_scanned,
         "summary": summary,
-    }
-async def lock_user(db, user_id, triggered_by_id, ws_manager=None):
+    }, events
+async def scan(db, ward_filter=None, user_name_filter=None, triggered_by_id=None, ws_manager=None):
+    log_rows, users = await db.run_sync(_window, ward_filter, user_name_filter)
+    hits = await asyncio.to_thread(_score, log_rows, users) if log_rows else []
+    async with AsyncSessionLocal() as w:
+        result, events = await w.run_sync(_record, hits, len(log_rows), users, ward_filter, user_name_filter, triggered_by_id)
+    if ws_manager:
+        for payload in events:
+            await ws_manager.broadcast(payload)
+    return result
+def _lock_user(db, user_id, triggered_by_id):
     target = db.query(User).filter(User.id == user_id).first()
     if not target:
-        return {"error": "user not found"}
+        return {"error": "user not found"}, None
     if target.is_locked:
-        return {"message": "already locked", "user_id": user_id}
+        return {"message": "already locked", "user_id": user_id}, None
     target.is_locked = 1
     uname = target.name
     alert = Alert(
@@ -161,13 +176,19 @@ async def lock_user(db, user_id, triggered_by_id, ws_manager=None):
         result_summary=f"{uname} manually locked",
     ))
     db.commit()
-    if ws_manager:
-        await ws_manager.broadcast({
-            "event": "user_locked",
-            "user_id": user_id,
-            "user_name": uname,
-            "alert_id": alert.id,
-            "severity": "high",
-            "created_at": alert.created_at.isoformat(),
-        })
-    return {"locked": True, "user_id": user_id, "user_name": uname, "alert_id": alert.id}
+    principals.invalidate(user_id)
+    event = {
+        "event": "user_locked",
+        "user_id": user_id,
+        "user_name": uname,
+        "alert_id": alert.id,
+        "severity": "high",
+        "created_at": alert.created_at.isoformat(),
+    }
+    return {"locked": True, "user_id": user_id, "user_name": uname, "alert_id": alert.id}, event
+async def lock_user(user_id, triggered_by_id, ws_manager=None):
+    async with AsyncSessionLocal() as w:
+        result, event = await w.run_sync(_lock_user, user_id, triggered_by_id)
+    if ws_manager and event:
+        await ws_manager.broadcast(event)
+    return result
@@ -0,0 +1,100 @@
+import asyncio
+from backend import rollups
+from backend.database import SessionLocal
+from backend.models import AccessLog
+from backend.config import AUDIT_DURABLE, AUDIT_FLUSH_MS, AUDIT_BATCH_SIZE
+class AuditWriter:
+    def __init__(self, flush_ms=AUDIT_FLUSH_MS, batch_size=AUDIT_BATCH_SIZE, durable=AUDIT_DURABLE):
+        self.flush_interval = flush_ms / 1000
+        self.batch_size = batch_size
+        self.durable = durable
+        self._loop = None
+        self._queue = None
+        self._full = None
+        self._task = None
+        self._outbox = None
+        self._sender = None
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._full = asyncio.Event()
+            self._task = loop.create_task(self._run())
+            self._outbox = asyncio.Queue()
+            self._sender = loop.create_task(self._send())
+    async def start(self):
+        self._ensure_running()
+    async def stop(self):
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        self._sender.cancel()
+        self._task = None
+    async def submit(self, row: dict, event: dict = None, ws_manager=None):
+        self._ensure_running()
+        fut = self._loop.create_future()
+        self._queue.put_nowait((row, event, ws_manager, fut))
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+        if self.durable:
+            return await fut
+        return None
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if self._queue.qsize() + 1 < self.batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [first]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    async def _flush(self, batch):
+        try:
+            ids = await asyncio.to_thread(self._write, [item[0] for item in batch])
+        except Exception as e:
+            if not self.durable:
+                print(f"audit write failed, {len(batch)} rows dropped: {e}")
+            for *_, fut in batch:
+                if fut.done():
+                    continue
+                if self.durable:
+                    fut.set_exception(e)
+                else:
+                    fut.set_result(None)
+            return
+        for (row, event, ws_manager, fut), lid in zip(batch, ids):
+            if not fut.done():
+                fut.set_result(lid)
+            if event is not None and ws_manager is not None:
+                event["log_id"] = lid
+                self._outbox.put_nowait((ws_manager, event))
+    async def _send(self):
+        while True:
+            ws_manager, event = await self._outbox.get()
+            try:
+                await ws_manager.broadcast(event)
+            except Exception as e:
+                print(f"audit broadcast failed: {e}")
+    def _write(self, rows):
+        db = SessionLocal()
+        try:
+            logs = [AccessLog(**r) for r in rows]
+            db.add_all(logs)
+            db.flush()
+            rollups.record(db, rows)
+            ids = [lg.id for lg in logs]
+            db.commit()
+            return ids
+        finally:
+            db.close()
+audit_writer = AuditWriter()
@@ -1,13 +1,26 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from fastapi import HTTPException
-from backend.config import JWT_SECRET, JWT_ALGORITHM, TOKEN_EXPIRY_HOURS
+from backend.config import JWT_SECRET, JWT_ALGORITHM, TOKEN_EXPIRY_HOURS, BCRYPT_WORKERS, BCRYPT_QUEUE
 pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def hash_password(plain):
     return pwd_ctx.hash(plain)
 def verify_password(plain, hashed):
     return pwd_ctx.verify(plain, hashed)
+_hash_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+async def verify_password_async(plain, hashed):
+    global _hash_pending
+    if _hash_pending >= BCRYPT_WORKERS + BCRYPT_QUEUE:
+        raise HTTPException(status_code=503, detail="login temporarily overloaded, retry shortly", headers={"Retry-After": "1"})
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, verify_password, plain, hashed)
+    finally:
+        _hash_pending -= 1
 def create_token(data: dict):
     payload = data.copy()
     payload["exp"] = datetime.utcnow() + timedelta(hours=TOKEN_EXPIRY_HOURS)
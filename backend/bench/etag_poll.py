@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sh_bench_"), "bench.db")
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.database import SessionLocal
+from backend.models import User, Patient, Alert
+from backend.auth import create_token
+POLLS = int(os.getenv("BENCH_POLLS", "300"))
+PATIENTS = int(os.getenv("BENCH_PATIENTS", "2000"))
+db = SessionLocal()
+admin = User(name="Bench Admin", email="bench@securehealth.in", password_hash="x", role="admin")
+doctor = User(name="Dr. Bench", email="drbench@securehealth.in", password_hash="x", role="doctor")
+db.add_all([admin, doctor])
+db.flush()
+for i in range(PATIENTS):
+    db.add(Patient(name=f"Bench Patient {i}", age=30 + i % 40, ward="Ward A", assigned_doctor_id=doctor.id, risk_score=0.5))
+for i in range(200):
+    db.add(Alert(user_id=doctor.id, alert_type="BULK_ACCESS", severity="medium", details=f"bench {i}"))
+db.commit()
+token = create_token({"sub": str(admin.id), "role": "admin"})
+db.close()
+client = TestClient(app)
+headers = {"Authorization": f"Bearer {token}"}
+def poll(path, conditional):
+    tag = None
+    sent = 0
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    for _ in range(POLLS):
+        h = {**headers, "If-None-Match": tag} if conditional and tag else headers
+        r = client.get(path, headers=h)
+        tag = r.headers.get("etag", tag)
+        sent += len(r.content)
+    return sent, time.perf_counter() - t0, time.process_time() - c0
+print(f"{'endpoint':<24}{'mode':<8}{'bytes':>12}{'wall ms/req':>14}{'cpu ms/req':>13}")
+for path in ("/patients/", "/patients/?limit=50", "/alerts/", "/users/"):
+    results = {}
+    for mode, conditional in (("full", False), ("etag", True)):
+        sent, wall, cpu = poll(path, conditional)
+        results[mode] = (sent, cpu)
+        print(f"{path:<24}{mode:<8}{sent:>12}{wall / POLLS * 1000:>14.2f}{cpu / POLLS * 1000:>13.2f}")
+    saved = 1 - results["etag"][0] / results["full"][0]
+    cpu_saved = 1 - results["etag"][1] / results["full"][1]
+    print(f"{'':<24}{'saved':<8}{saved:>12.1%}{'':>14}{cpu_saved:>13.1%}")
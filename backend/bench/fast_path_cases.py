@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sh_fast_"), "fast.db")
+from backend.database import SessionLocal, engine
+from backend.migrations import migrate
+from backend.models import User, Patient, PatientScheme, SchemeMapping
+from backend.scope import ScopeService
+from backend.agents.fast_path import answer
+migrate(engine)
+db = SessionLocal()
+admin = User(name="Case Admin", email="case-admin@securehealth.in", password_hash="x", role="admin")
+rao = User(name="Dr. Sunita Rao", email="case-rao@securehealth.in", password_hash="x", role="doctor")
+mehta = User(name="Dr. Arun Mehta", email="case-mehta@securehealth.in", password_hash="x", role="doctor")
+db.add_all([admin, rao, mehta])
+db.flush()
+nurse = User(name="Case Nurse", email="case-nurse@securehealth.in", password_hash="x", role="nurse",
+             department="Ward A", supervising_doctor_id=rao.id)
+db.add(nurse)
+db.add(SchemeMapping(scheme_name="PMMVY", state="ALL", eligibility_criteria='{"min_age": 19, "max_age": 45}', benefit_amount=5000))
+db.flush()
+diagnoses = ["Dengue Fever", "Anaemia", "Gestational Diabetes", None]
+for i in range(120):
+    ward = ("Ward A", "Ward B", "ICU")[i % 3]
+    p = Patient(name=f"Case Patient {i}", age=18 + i % 40, ward=ward,
+                assigned_doctor_id=(mehta if ward == "ICU" else rao).id,
+                risk_score=(i % 100) / 100, diagnosis=diagnoses[i % 4])
+    db.add(p)
+    db.flush()
+    if 19 <= p.age <= 45:
+        db.add(PatientScheme(patient_id=p.id, scheme_name="PMMVY"))
+db.commit()
+users = {"admin": admin, "doctor": rao, "nurse": nurse}
+FALLS_THROUGH = [
+    ("admin", "how many patients have dengue fever"),
+    ("admin", "how many patients in ward b are older than 40"),
+    ("admin", "how many patients does Dr. Sunita Rao have"),
+    ("admin", "how many patients does sunita rao have"),
+    ("admin", "how many patients were admitted this week"),
+    ("admin", "how many patients are not eligible for PMMVY"),
+    ("admin", "how many high and low risk patients"),
+    ("doctor", "how many patients in the ICU"),
+    ("doctor", "average risk in ward z"),
+    ("nurse", "how many patients in ward b"),
+    ("admin", "top 5 youngest high risk patients"),
+    ("admin", "list high risk patients with anaemia"),
+    ("admin", "average risk of patients over 35"),
+    ("admin", "lowest risk patients"),
+    ("admin", "why are my patients high risk"),
+    ("admin", "what is the risk for patient 55"),
+]
+FAST = [
+    ("doctor", "How many high-risk patients do I have?", "count"),
+    ("admin", "how many patients in the ICU", "count"),
+    ("admin", "um, what's the average risk score in ward a", "average_risk"),
+    ("admin", "show me the top five highest risk patients", "top_risk"),
+    ("admin", "How many qualify for PMMVY?", "scheme_eligibility"),
+    ("admin", "which schemes are patients eligible for", "scheme_eligibility"),
+    ("nurse", "Show risk distribution", "risk_distribution"),
+    ("admin", "ward breakdown please", "ward_breakdown"),
+    ("admin", "which ward has the most high risk patients", "ward_breakdown"),
+    ("doctor", "which patients are high risk", "top_risk"),
+]
+scopes = ScopeService()
+failures = 0
+for role, question in FALLS_THROUGH:
+    got = answer(db, scopes.for_user(db, users[role]), question)
+    ok = got is None
+    failures += not ok
+    print(f"{'ok' if ok else 'FAIL':<5}{role:<7}{question!r} -> {'llm' if got is None else got[0]}")
+for role, question, intent in FAST:
+    got = answer(db, scopes.for_user(db, users[role]), question)
+    ok = got is not None and got[0] == intent
+    failures += not ok
+    print(f"{'ok' if ok else 'FAIL':<5}{role:<7}{question!r} -> {'llm' if got is None else got[0]}")
+db.close()
+print(f"{len(FALLS_THROUGH) + len(FAST) - failures}/{len(FALLS_THROUGH) + len(FAST)} fast-path cases routed as expected")
+sys.exit(1 if failures else 0)
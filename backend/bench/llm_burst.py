@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import random
+import socket
+import asyncio
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+DELAY_MS = int(os.getenv("STUB_DELAY_MS", "200"))
+FAIL_RATE = float(os.getenv("STUB_FAIL_RATE", "0.3"))
+stub = FastAPI()
+stats = {"requests": 0, "failures": 0, "active": 0, "peak": 0}
+mode = {"fail_rate": 0.0, "delay": DELAY_MS / 1000}
+class Prompt(BaseModel):
+    prompt: str
+@stub.post("/generate")
+async def generate(body: Prompt):
+    stats["requests"] += 1
+    stats["active"] += 1
+    stats["peak"] = max(stats["peak"], stats["active"])
+    try:
+        await asyncio.sleep(mode["delay"])
+        if random.random() < mode["fail_rate"]:
+            stats["failures"] += 1
+            raise HTTPException(status_code=503, detail="stub overloaded")
+        return {"text": f"stub answer ({len(body.prompt)} chars)"}
+    finally:
+        stats["active"] -= 1
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+os.environ["LLM_ENDPOINT"] = f"http://127.0.0.1:{port}/generate"
+server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+while not server.started:
+    time.sleep(0.05)
+from backend.agents.llm_backends import HTTPBackend
+from backend.agents.llm_client import LLMClient, LLMError
+def reset():
+    stats.update(requests=0, failures=0, active=0, peak=0)
+async def burst(client, prompts):
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(client.generate(p) for p in prompts), return_exceptions=True)
+    ok = sum(1 for r in results if not isinstance(r, Exception))
+    return ok, time.perf_counter() - t0
+async def main():
+    complete = HTTPBackend(os.environ["LLM_ENDPOINT"]).complete
+    client = LLMClient(complete, timeout=10, concurrency=8, retries=3, backoff_ms=50)
+    reset()
+    ok, t = await burst(client, ["how many high-risk patients do I have?"] * 100)
+    print(f"100 identical prompts : {ok} ok in {t * 1000:.0f} ms, upstream requests {stats['requests']}, coalesced {client.coalesced}")
+    reset()
+    ok, t = await burst(client, [f"question {i}" for i in range(64)])
+    print(f"64 distinct prompts   : {ok} ok in {t * 1000:.0f} ms, upstream peak concurrency {stats['peak']} (cap {client.concurrency})")
+    reset()
+    mode["fail_rate"] = FAIL_RATE
+    ok, t = await burst(client, [f"flaky {i}" for i in range(64)])
+    print(f"{FAIL_RATE:.0%} upstream failures : {ok}/64 ok after retries, upstream requests {stats['requests']}, failures {stats['failures']}")
+    mode["fail_rate"] = 0.0
+    mode["delay"] = 2.0
+    slow = LLMClient(complete, timeout=0.5, concurrency=8, retries=3, backoff_ms=50)
+    t0 = time.perf_counter()
+    try:
+        await slow.generate("slow question")
+        outcome = "answered"
+    except LLMError as e:
+        outcome = f"LLMError({e})"
+    print(f"2 s upstream, 0.5 s deadline: {outcome} after {(time.perf_counter() - t0) * 1000:.0f} ms")
+asyncio.run(main())
+server.should_exit = True
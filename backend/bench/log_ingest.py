@@ -0,0 +1,54 @@
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sh_bench_"), "bench.db")
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.database import SessionLocal
+from backend.models import User, Patient
+from backend.auth import create_token
+TOTAL = int(os.getenv("BENCH_EVENTS", "100000"))
+BATCH = int(os.getenv("BENCH_BATCH", "5000"))
+SINGLE = int(os.getenv("BENCH_SINGLE", "500"))
+db = SessionLocal()
+admin = User(name="Bench Admin", email="bench@securehealth.in", password_hash="x", role="admin")
+db.add(admin)
+db.flush()
+pids = []
+for i in range(200):
+    p = Patient(name=f"Bench Patient {i}", age=30, ward="Ward A", risk_score=0.5)
+    db.add(p)
+    db.flush()
+    pids.append(p.id)
+db.commit()
+token = create_token({"sub": str(admin.id), "role": "admin"})
+db.close()
+client = TestClient(app)
+headers = {"Authorization": f"Bearer {token}"}
+def event():
+    return {
+        "patient_id": random.choice(pids),
+        "action": random.choice(["VIEW", "EDIT", "EXPORT"]),
+        "resource": "patient_record",
+        "ip_address": f"10.0.1.{random.randint(10, 200)}",
+    }
+t0 = time.perf_counter()
+for _ in range(SINGLE):
+    client.post("/logs/", json=event(), headers=headers)
+single_rate = SINGLE / (time.perf_counter() - t0)
+payloads = []
+for _ in range(TOTAL // BATCH):
+    payloads.append("\n".join(json.dumps(event()) for _ in range(BATCH)).encode())
+inserted = 0
+t0 = time.perf_counter()
+for body in payloads:
+    r = client.post("/logs/batch", content=body, headers={**headers, "Content-Type": "application/x-ndjson"})
+    inserted += r.json()["inserted"]
+batch_rate = inserted / (time.perf_counter() - t0)
+print(f"POST /logs/       : {single_rate:10.0f} events/s ({SINGLE} events)")
+print(f"POST /logs/batch  : {batch_rate:10.0f} events/s ({inserted} events, batch={BATCH})")
+print(f"speedup           : {batch_rate / single_rate:10.1f}x")
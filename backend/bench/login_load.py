@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sh_bench_"), "bench.db")
+import httpx
+import uvicorn
+from backend.main import app
+from backend.database import SessionLocal
+from backend.models import User
+from backend.auth import hash_password, create_token, verify_password
+from backend.routers import auth_router
+LOGINS = int(os.getenv("BENCH_LOGINS", "120"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "50"))
+PROBE_MS = int(os.getenv("BENCH_PROBE_MS", "20"))
+db = SessionLocal()
+pw_hash = hash_password("bench-password")
+users = [User(name=f"Bench Nurse {i}", email=f"bench{i}@securehealth.in", password_hash=pw_hash, role="nurse") for i in range(LOGINS)]
+admin = User(name="Bench Admin", email="bench-admin@securehealth.in", password_hash=pw_hash, role="admin")
+db.add_all(users + [admin])
+db.commit()
+emails = [u.email for u in users]
+token = create_token({"sub": str(admin.id), "role": "admin"})
+db.close()
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+while not server.started:
+    time.sleep(0.05)
+base = f"http://127.0.0.1:{port}"
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] * 1000 if xs else 0.0
+async def run():
+    async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+        done = asyncio.Event()
+        probes = []
+        async def probe():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+                probes.append(time.perf_counter() - t0)
+                await asyncio.sleep(PROBE_MS / 1000)
+        sem = asyncio.Semaphore(CONCURRENCY)
+        latencies = []
+        codes = {}
+        async def login(email):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/auth/login", data={"username": email, "password": "bench-password"})
+                latencies.append(time.perf_counter() - t0)
+                codes[r.status_code] = codes.get(r.status_code, 0) + 1
+        prober = asyncio.create_task(probe())
+        await asyncio.sleep(0.5)
+        idle = list(probes)
+        probes.clear()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(login(e) for e in emails))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await prober
+        return idle, probes, latencies, codes, elapsed
+async def inline_verify(plain, hashed):
+    return verify_password(plain, hashed)
+for mode in ("inline", "executor"):
+    if mode == "inline":
+        original = auth_router.verify_password_async
+        auth_router.verify_password_async = inline_verify
+    else:
+        auth_router.verify_password_async = original
+    idle, busy, latencies, codes, elapsed = asyncio.run(run())
+    print(f"[{mode}] {LOGINS} logins, concurrency {CONCURRENCY}: {LOGINS / elapsed:.1f} logins/s, status {codes}")
+    print(f"  login latency   p50 {pct(latencies, 0.5):8.1f} ms  p99 {pct(latencies, 0.99):8.1f} ms")
+    print(f"  /auth/me idle   p50 {pct(idle, 0.5):8.1f} ms  p99 {pct(idle, 0.99):8.1f} ms")
+    print(f"  /auth/me storm  p50 {pct(busy, 0.5):8.1f} ms  p99 {pct(busy, 0.99):8.1f} ms  ({len(busy)} probes)")
+server.should_exit = True
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+import subprocess
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+PROFILES = {
+    "legacy": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+    },
+    "tuned": {},
+}
+SECONDS = float(os.getenv("BENCH_SECONDS", "5"))
+READERS = int(os.getenv("BENCH_READERS", "8"))
+WRITERS = int(os.getenv("BENCH_WRITERS", "2"))
+PATIENTS = int(os.getenv("BENCH_PATIENTS", "2000"))
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] * 1000 if xs else 0.0
+def worker():
+    from sqlalchemy import func
+    from backend.database import engine, Base, SessionLocal, ReadSession
+    from backend.models import User, Patient, AccessLog
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    doctor = User(name="Dr. Bench", email="drbench@securehealth.in", password_hash="x", role="doctor")
+    db.add(doctor)
+    db.flush()
+    db.add_all([
+        Patient(name=f"Bench Patient {i}", age=20 + i % 60, ward=f"Ward {'ABCD'[i % 4]}",
+                assigned_doctor_id=doctor.id, risk_score=(i % 100) / 100)
+        for i in range(PATIENTS)
+    ])
+    db.commit()
+    doctor_id = doctor.id
+    db.close()
+    stop = threading.Event()
+    reads, writes, read_lat, write_lat, errors = [], [], [], [], []
+    def reader():
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                s = ReadSession()
+                s.query(Patient).filter(Patient.assigned_doctor_id == doctor_id).order_by(Patient.risk_score.desc()).limit(50).all()
+                s.query(AccessLog.action, func.count()).group_by(AccessLog.action).all()
+                s.close()
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            read_lat.append(time.perf_counter() - t0)
+            reads.append(1)
+    def writer():
+        i = 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                s = SessionLocal()
+                s.add(AccessLog(user_id=doctor_id, patient_id=1 + i % PATIENTS, action="VIEW", resource="patient_record", ip_address="127.0.0.1"))
+                s.commit()
+                s.close()
+            except Exception as e:
+                errors.append(repr(e))
+                continue
+            write_lat.append(time.perf_counter() - t0)
+            writes.append(1)
+            i += 1
+    threads = [threading.Thread(target=reader) for _ in range(READERS)] + [threading.Thread(target=writer) for _ in range(WRITERS)]
+    for t in threads:
+        t.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for t in threads:
+        t.join()
+    with engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    print(json.dumps({
+        "journal_mode": mode,
+        "reads_s": len(reads) / SECONDS,
+        "writes_s": len(writes) / SECONDS,
+        "read_p50": pct(read_lat, 0.5),
+        "read_p99": pct(read_lat, 0.99),
+        "write_p50": pct(write_lat, 0.5),
+        "write_p99": pct(write_lat, 0.99),
+        "errors": len(errors),
+    }))
+if os.getenv("BENCH_CHILD"):
+    worker()
+    sys.exit(0)
+print(f"{READERS} readers + {WRITERS} writers for {SECONDS:.0f}s, {PATIENTS} patients")
+print(f"{'profile':<8}{'journal':>9}{'reads/s':>10}{'writes/s':>10}{'read p50':>10}{'read p99':>10}{'write p50':>11}{'write p99':>11}{'errors':>8}")
+for name, overrides in PROFILES.items():
+    env = {**os.environ, **overrides, "BENCH_CHILD": "1", "DB_PATH": os.path.join(tempfile.mkdtemp(prefix="sh_bench_"), "bench.db")}
+    out = subprocess.run([sys.executable, "-m", "backend.bench.mixed_rw"], env=env, capture_output=True, text=True,
+                         cwd=os.path.join(os.path.dirname(__file__), "..", ".."))
+    if out.returncode:
+        print(out.stderr)
+        sys.exit(out.returncode)
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"{name:<8}{r['journal_mode']:>9}{r['reads_s']:>10.0f}{r['writes_s']:>10.0f}{r['read_p50']:>8.1f}ms{r['read_p99']:>8.1f}ms"
+          f"{r['write_p50']:>9.1f}ms{r['write_p99']:>9.1f}ms{r['errors']:>8}")
@@ -0,0 +1,128 @@
+import os
+import re
+import sys
+import sqlite3
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sh_plans_"), "plans.db")
+os.environ.setdefault("LLM_BACKEND", "stub")
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.config import DB_PATH
+from backend.database import SessionLocal, engine, read_engine, async_engine, async_read_engine
+from backend.models import Base, User, Patient, PatientScheme, AccessLog, Alert, AgentCommand, SchemeMapping
+from backend.auth import create_token
+SMALL_TABLES = {"users", "scheme_mappings", "table_versions", "scope_versions"}
+PLANNED = ("SELECT", "WITH", "UPDATE", "DELETE")
+ALIAS_RE = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?\s+(?:AS\s+)?"?(\w+)"?', re.I)
+SCAN_RE = re.compile(r"^SCAN (\w+)\b")
+MAX_REPEATS = 3
+db = SessionLocal()
+admin = User(name="Plan Admin", email="plan-admin@securehealth.in", password_hash="x", role="admin")
+doctors = [User(name=f"Dr. Plan {i}", email=f"plan-dr{i}@securehealth.in", password_hash="x", role="doctor") for i in range(8)]
+db.add_all([admin] + doctors)
+db.flush()
+nurse = User(name="Plan Nurse", email="plan-nurse@securehealth.in", password_hash="x", role="nurse",
+             department="Ward A", supervising_doctor_id=doctors[0].id)
+db.add(nurse)
+db.add_all([
+    SchemeMapping(scheme_name="PMMVY", state="ALL", eligibility_criteria='{"min_age": 19, "max_age": 45}', benefit_amount=5000),
+    SchemeMapping(scheme_name="MaatriNet", state="ALL", eligibility_criteria='{"min_age": 18, "max_age": 50}', benefit_amount=1000),
+])
+db.flush()
+now = datetime.utcnow()
+db.execute(Patient.__table__.insert(), [
+    {"name": f"Plan Patient {i}", "age": 18 + i % 40, "ward": f"Ward {'ABCDEFGH'[i % 8]}",
+     "assigned_doctor_id": doctors[i % 8].id, "risk_score": (i % 100) / 100, "diagnosis": "Anaemia"}
+    for i in range(4000)
+])
+db.execute(PatientScheme.__table__.insert(), [{"patient_id": i, "scheme_name": "PMMVY"} for i in range(1, 4001, 2)])
+db.execute(AccessLog.__table__.insert(), [
+    {"user_id": doctors[i % 8].id, "patient_id": 1 + i % 4000, "action": "VIEW", "resource": "patient_record",
+     "ip_address": "10.0.0.1", "timestamp": now - timedelta(minutes=i), "anomaly_score": 0.0, "flagged": 0}
+    for i in range(20000)
+])
+db.execute(Alert.__table__.insert(), [
+    {"user_id": doctors[i % 8].id, "alert_type": "anomaly_detected", "severity": "medium", "details": "{}",
+     "resolved": i % 2, "auto_locked": 0, "created_at": now - timedelta(hours=i)}
+    for i in range(500)
+])
+db.execute(AgentCommand.__table__.insert(), [
+    {"issued_by": admin.id, "agent": ("threat_hunter", "privacy_query")[i % 2], "command_text": "scan",
+     "result_summary": "ok", "created_at": now - timedelta(hours=i)}
+    for i in range(500)
+])
+db.commit()
+who = {u.role if u.role != "doctor" else "doctor": u for u in (admin, doctors[0], nurse)}
+tokens = {role: {"Authorization": f"Bearer {create_token({'sub': str(u.id), 'role': u.role})}"} for role, u in who.items()}
+db.close()
+since = (now - timedelta(days=1)).isoformat()
+CASES = [
+    ("patients: doctor list", "get", "/patients/?limit=50", "doctor", {}, ()),
+    ("patients: nurse list", "get", "/patients/?limit=50", "nurse", {}, ()),
+    ("patients: doctor search", "get", "/patients/?q=anaemia&limit=20", "doctor", {}, ()),
+    ("patients: ward filter", "get", "/patients/?ward=Ward%20B&limit=20", "admin", {}, ()),
+    ("patients: admin list", "get", "/patients/?limit=50", "admin", {}, ("patients",)),
+    ("patients: doctor risk summary", "get", "/patients/risk-summary", "doctor", {}, ()),
+    ("patients: admin risk summary", "get", "/patients/risk-summary", "admin", {}, ("patients", "patient_schemes")),
+    ("patients: get", "get", "/patients/1", "doctor", {}, ()),
+    ("patients: edit", "patch", "/patients/1", "doctor", {"json": {"diagnosis": "Anaemia"}}, ()),
+    ("logs: my", "get", "/logs/my?limit=50", "doctor", {}, ()),
+    ("logs: by user", "get", f"/logs/?user_id={who['doctor'].id}&limit=50", "admin", {}, ()),
+    ("logs: time window", "get", f"/logs/?from_dt={since}&limit=50", "admin", {}, ()),
+    ("logs: latest", "get", "/logs/?limit=50", "admin", {}, ("access_logs",)),
+    ("logs: stats", "get", "/logs/stats", "admin", {}, ()),
+    ("logs: stats by user", "get", f"/logs/stats?user_id={who['doctor'].id}&bucket=day", "admin", {}, ()),
+    ("logs: write", "post", "/logs/", "doctor", {"json": {"patient_id": 1, "action": "view", "resource": "patient_record"}}, ()),
+    ("alerts: list", "get", "/alerts/", "admin", {}, ()),
+    ("agents: threat-hunter status", "get", "/agents/threat-hunter/status", "admin", {}, ()),
+    ("agents: command history", "get", "/agents/commands", "admin", {}, ("agent_commands",)),
+    ("agents: privacy query (sql)", "post", "/agents/privacy-query/ask", "doctor", {"json": {"question": "how many high risk patients"}}, ()),
+    ("agents: privacy query (llm)", "post", "/agents/privacy-query/ask", "doctor", {"json": {"question": "tell me about patient 1"}}, ()),
+    ("auth: me", "get", "/auth/me", "doctor", {}, ()),
+    ("users: list", "get", "/users/", "admin", {}, ()),
+]
+captured = []
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if not executemany and statement.lstrip().upper().startswith(PLANNED):
+        captured.append((statement, tuple(parameters or ())))
+for e in (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine):
+    event.listen(e, "before_cursor_execute", _capture)
+def full_scans(plan_db, statement, parameters, allowed):
+    aliases = {alias: table for table, alias in ALIAS_RE.findall(statement)}
+    bad = []
+    for row in plan_db.execute("EXPLAIN QUERY PLAN " + statement, parameters):
+        m = SCAN_RE.match(row[3])
+        if not m:
+            continue
+        table = aliases.get(m.group(1), m.group(1))
+        if table in Base.metadata.tables and table not in SMALL_TABLES and table not in allowed:
+            bad.append(row[3] if table == m.group(1) else f"{row[3]} ({table})")
+    return bad
+failures = 0
+plan_db = sqlite3.connect(DB_PATH)
+with TestClient(app) as client:
+    for label, method, path, role, kwargs, allowed in CASES:
+        captured.clear()
+        r = getattr(client, method)(path, headers=tokens[role], **kwargs)
+        if r.status_code >= 400:
+            print(f"ERROR {label}: {method.upper()} {path} -> {r.status_code}")
+            failures += 1
+            continue
+        problems = []
+        for statement, parameters in dict.fromkeys(captured):
+            for scan in full_scans(plan_db, statement, parameters, allowed):
+                problems.append((scan, " ".join(statement.split())[:160]))
+        for statement, n in Counter(s for s, _ in captured).items():
+            if n > MAX_REPEATS:
+                problems.append((f"N+1 ({n} runs)", " ".join(statement.split())[:160]))
+        print(f"{'FAIL' if problems else 'ok':<5}{label} ({len(set(captured))} statements)")
+        for scan, sql in problems:
+            print(f"       {scan}: {sql}")
+        failures += bool(problems)
+plan_db.close()
+print(f"{len(CASES) - failures}/{len(CASES)} query paths index-backed")
+sys.exit(1 if failures else 0)
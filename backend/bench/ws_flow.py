@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="sh_bench_"), "bench.db")
+os.environ.setdefault("LLM_BACKEND", "stub")
+import httpx
+import uvicorn
+import websockets
+from sqlalchemy import text
+from backend.main import app, ws_manager
+from backend.database import SessionLocal, AsyncReadSession
+from backend.models import User, Patient, AccessLog
+from backend.auth import create_token
+PATIENTS = int(os.getenv("BENCH_PATIENTS", "50000"))
+LOGS = int(os.getenv("BENCH_LOGS", "200000"))
+HEAVY = int(os.getenv("BENCH_HEAVY", "24"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "6"))
+TICK_MS = int(os.getenv("BENCH_TICK_MS", "20"))
+HEAVY_SQL = text(
+    "SELECT p.ward, count(*), avg(p.risk_score), count(DISTINCT l.user_id) "
+    "FROM access_logs l JOIN patients p ON p.id = l.patient_id GROUP BY p.ward"
+)
+db = SessionLocal()
+admin = User(name="Bench Admin", email="bench@securehealth.in", password_hash="x", role="admin")
+doctor = User(name="Dr. Bench", email="drbench@securehealth.in", password_hash="x", role="doctor")
+db.add_all([admin, doctor])
+db.flush()
+db.execute(Patient.__table__.insert(), [
+    {"name": f"Bench Patient {i}", "age": 20 + i % 60, "ward": f"Ward {'ABCDEFGH'[i % 8]}",
+     "assigned_doctor_id": doctor.id, "risk_score": (i % 100) / 100}
+    for i in range(PATIENTS)
+])
+db.execute(AccessLog.__table__.insert(), [
+    {"user_id": doctor.id, "patient_id": 1 + i % PATIENTS, "action": "VIEW", "resource": "patient_record",
+     "ip_address": "127.0.0.1", "anomaly_score": 0.0, "flagged": 0}
+    for i in range(LOGS)
+])
+db.commit()
+token = create_token({"sub": str(admin.id), "role": admin.role})
+db.close()
+@app.post("/bench/heavy/sync")
+async def heavy_sync():
+    s = SessionLocal()
+    try:
+        return {"rows": len(s.execute(HEAVY_SQL).all())}
+    finally:
+        s.close()
+@app.post("/bench/heavy/async")
+async def heavy_async():
+    async with AsyncReadSession() as s:
+        return {"rows": len((await s.execute(HEAVY_SQL)).all())}
+async def ticker():
+    while True:
+        await ws_manager.broadcast({"event": "bench_tick", "sent": time.perf_counter()})
+        await asyncio.sleep(TICK_MS / 1000)
+@app.on_event("startup")
+async def start_ticker():
+    asyncio.get_running_loop().create_task(ticker())
+with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+while not server.started:
+    time.sleep(0.05)
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(len(xs) * p))] * 1000 if xs else 0.0
+async def run(path, body=None):
+    gaps = []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/alerts") as ws:
+        stop = asyncio.Event()
+        async def listen():
+            last = None
+            while not stop.is_set():
+                try:
+                    msg = json.loads(await asyncio.wait_for(ws.recv(), 1))
+                except asyncio.TimeoutError:
+                    continue
+                if msg.get("event") != "bench_tick":
+                    continue
+                now = time.perf_counter()
+                if last is not None:
+                    gaps.append(now - last)
+                last = now
+        listener = asyncio.create_task(listen())
+        await asyncio.sleep(0.5)
+        latencies = []
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300,
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+            sem = asyncio.Semaphore(CONCURRENCY)
+            async def one():
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await client.post(path, json=body)
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(HEAVY)))
+            elapsed = time.perf_counter() - t0
+        stop.set()
+        await listener
+    return gaps, latencies, elapsed
+print(f"{HEAVY} heavy requests x{CONCURRENCY} over {PATIENTS} patients / {LOGS} logs; server ticks every {TICK_MS} ms")
+print(f"{'handler':<28}{'req p50':>10}{'wall s':>8}{'ticks':>7}{'gap p50':>10}{'gap p99':>10}{'gap max':>10}")
+for name, path, body in (
+    ("sync session in async def", "/bench/heavy/sync", None),
+    ("AsyncSession (aiosqlite)", "/bench/heavy/async", None),
+    ("privacy-query ask", "/agents/privacy-query/ask", {"question": "list patients in ward a with their diagnosis"}),
+):
+    gaps, latencies, elapsed = asyncio.run(run(path, body))
+    print(f"{name:<28}{pct(latencies, 0.5):>8.0f}ms{elapsed:>8.1f}{len(gaps):>7}"
+          f"{pct(gaps, 0.5):>8.0f}ms{pct(gaps, 0.99):>8.0f}ms{max(gaps) * 1000 if gaps else 0:>8.0f}ms")
+server.should_exit = True
@@ -0,0 +1,67 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+_MISSING = object()
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    def get(self, key, default=None):
+        with self._lock:
+            hit = self._data.get(key, _MISSING)
+            if hit is _MISSING:
+                return default
+            value, expires = hit
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    def pop(self, key):
+        with self._lock:
+            hit = self._data.pop(key, None)
+        return hit[0] if hit else None
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+    def discard_where(self, predicate):
+        with self._lock:
+            stale = [k for k in self._data if predicate(k)]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    def __len__(self):
+        return len(self._data)
+class SharedEpoch:
+    def __init__(self, path):
+        self.path = path
+        self._seen = self._read()
+    def _read(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+    def bump(self):
+        now = max(time.time_ns(), self._read() + 1)
+        with open(self.path, "a"):
+            pass
+        os.utime(self.path, ns=(now, now))
+    def changed(self):
+        current = self._read()
+        if current == self._seen:
+            return False
+        self._seen = current
+        return True
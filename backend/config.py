@@ -5,8 +5,53 @@ JWT_SECRET = os.getenv("JWT_SECRET", "sh_jwt_s3cr3t_2024")
 JWT_ALGORITHM = "HS256"
 TOKEN_EXPIRY_HOURS = 12
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+LLM_ENDPOINT = os.getenv("LLM_ENDPOINT", "")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "http" if LLM_ENDPOINT else "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "")
+LLM_MODEL_CACHE_TTL = int(os.getenv("LLM_MODEL_CACHE_TTL", "86400"))
+STUB_LLM_TOKEN_MS = int(os.getenv("STUB_LLM_TOKEN_MS", "0"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF_MS = int(os.getenv("LLM_BACKOFF_MS", "250"))
+PQ_MAX_ROWS = int(os.getenv("PQ_MAX_ROWS", "200"))
+PQ_CACHE_SIZE = int(os.getenv("PQ_CACHE_SIZE", "1024"))
+PQ_CACHE_TTL = int(os.getenv("PQ_CACHE_TTL", "600"))
 DB_PATH = os.getenv("DB_PATH", "securehealth.db")
 DB_URL = f"sqlite:///{DB_PATH}"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "8"))
+READ_POOL_OVERFLOW = int(os.getenv("READ_POOL_OVERFLOW", "32"))
+LLM_MODEL_CACHE = os.getenv("LLM_MODEL_CACHE", os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), ".llm_models.json"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "log_archive"))
+LOG_ARCHIVE_PARTITION = os.getenv("LOG_ARCHIVE_PARTITION", "month")
+LOG_ARCHIVE_BLOCK_ROWS = int(os.getenv("LOG_ARCHIVE_BLOCK_ROWS", "5000"))
+LOG_BATCH_MAX = int(os.getenv("LOG_BATCH_MAX", "100000"))
+LOG_BATCH_BROADCAST_SAMPLE = 50
+LOG_CLOCK_SKEW_SECONDS = int(os.getenv("LOG_CLOCK_SKEW_SECONDS", "300"))
+PATIENT_IMPORT_MAX = int(os.getenv("PATIENT_IMPORT_MAX", "100000"))
+PATIENT_IMPORT_BATCH = 1000
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+AUDIT_DURABLE = os.getenv("AUDIT_DURABLE", "1") == "1"
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "5"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "256"))
+HOSPITAL_STATE = os.getenv("HOSPITAL_STATE", "Maharashtra")
+ELIGIBILITY_EPOCH_FILE = os.getenv("ELIGIBILITY_EPOCH_FILE", os.path.abspath(DB_PATH) + ".eligibility")
+SCOPE_TTL = int(os.getenv("SCOPE_TTL", "300"))
+SCOPE_EPOCH_FILE = os.getenv("SCOPE_EPOCH_FILE", os.path.abspath(DB_PATH) + ".scopes")
+RISK_SUMMARY_TTL = int(os.getenv("RISK_SUMMARY_TTL", "300"))
+SESSION_WINDOW_MINUTES = int(os.getenv("SESSION_WINDOW_MINUTES", "60"))
+SESSION_RING_SIZE = int(os.getenv("SESSION_RING_SIZE", "8"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_QUEUE = int(os.getenv("BCRYPT_QUEUE", "64"))
+PRINCIPAL_TTL = int(os.getenv("PRINCIPAL_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+PRINCIPAL_EPOCH_FILE = os.getenv("PRINCIPAL_EPOCH_FILE", os.path.abspath(DB_PATH) + ".principals")
 ANOMALY_MEDIUM = 0.4
 ANOMALY_HIGH = 0.7
 ANOMALY_CRITICAL = 0.9
@@ -3,15 +3,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 from collections import defaultdict
 from backend.database import SessionLocal, engine
 from backend.models import User, Patient, Base
-from sqlalchemy import text
-with engine.connect() as conn:
-    try:
-        conn.execute(text("ALTER TABLE users ADD COLUMN supervising_doctor_id INTEGER REFERENCES users(id)"))
-        conn.commit()
-        print("Added supervising_doctor_id column")
-    except Exception:
-        conn.rollback()
-        print("supervising_doctor_id column already exists")
+from backend.migrations import migrate
+migrate(engine)
 db = SessionLocal()
 doctors = db.query(User).filter(User.role == 'doctor').order_by(User.id).all()
 nurses  = db.query(User).filter(User.role == 'nurse').order_by(User.id).all()
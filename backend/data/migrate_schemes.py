@@ -0,0 +1,39 @@
+import sys
+import os
+import json
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from sqlalchemy import inspect, text
+from backend.database import engine, SessionLocal
+from backend.models import PatientScheme
+from backend.schemes import scheme_ids
+def migrate_scheme_eligibility(bind=engine):
+    cols = [c["name"] for c in inspect(bind).get_columns("patients")]
+    if "scheme_eligible" not in cols:
+        return 0
+    db = SessionLocal(bind=bind)
+    try:
+        rows = db.execute(text(
+            "SELECT id, scheme_eligible FROM patients WHERE scheme_eligible IS NOT NULL"
+        )).all()
+        if not rows:
+            return 0
+        ids = scheme_ids(db)
+        links = []
+        for pid, raw in rows:
+            try:
+                names = json.loads(raw) or []
+            except ValueError:
+                names = []
+            links.extend({"patient_id": pid, "scheme_name": n, "scheme_id": ids.get(n)} for n in set(names))
+        if links:
+            db.execute(PatientScheme.__table__.insert().prefix_with("OR IGNORE"), links)
+        db.execute(text("UPDATE patients SET scheme_eligible = NULL WHERE scheme_eligible IS NOT NULL"))
+        db.commit()
+        return len(rows)
+    finally:
+        db.close()
+if __name__ == "__main__":
+    from backend.migrations import migrate
+    migrate(engine)
+    n = migrate_scheme_eligibility()
+    print(f"Migrated scheme eligibility for {n} patients into patient_schemes.")
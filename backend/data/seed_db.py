@@ -7,6 +7,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 from backend.database import engine, SessionLocal, Base
 from backend.models import User, Patient, AccessLog, SchemeMapping
 from backend.auth import hash_password
+from backend import eligibility, rollups, schemes
 from backend.data.maternal_schemes import SCHEME_LIST
 from backend.data.synthetic_logs import (
     generate_normal_logs,
@@ -113,19 +114,6 @@ MEDICAL_DATA_MAP = {
         "treatments": ["FAST Scan", "Intubation", "ECG monitoring", "Gastric lavage"],
     }
 }
-def eligible_schemes(age):
-    matches = []
-    local_state = "Maharashtra"
-    for s in SCHEME_LIST:
-        criteria = json.loads(s["eligibility_criteria"])
-        min_a = criteria.get("min_age", 0)
-        max_a = criteria.get("max_age", 999)
-        if age < min_a or age > max_a:
-            continue
-        if s["state"] not in ("ALL", local_state):
-            continue
-        matches.append(s["scheme_name"])
-    return list(set(matches))
 admins = []
 for i in range(3):
     u = User(
@@ -171,19 +159,23 @@ for s in SCHEME_LIST:
         benefit_amount=s["benefit_amount"],
     )
     db.add(sm)
+db.flush()
+scheme_ids_by_name = schemes.scheme_ids(db)
 patients = []
 unique_names = generate_unique_names(200)
+ages = [random.randint(18, 48) for _ in range(200)]
+eligible = eligibility.EligibilityEngine(eligibility.rules_from_list(SCHEME_LIST)).evaluate_many(ages)
 for i in range(200):
-    age = random.randint(18, 48)
+    age = ages[i]
     ward = random.choice(WARDS)
     risk = round(random.uniform(0.05, 0.95), 3)
     p = Patient(
         name=unique_names[i],
         age=age,
         ward=ward,
-        scheme_eligible=json.dumps(eligible_schemes(age)),
         risk_score=risk,
     )
+    schemes.assign(db, p, eligible[i], scheme_ids_by_name)
     db.add(p)
     patients.append(p)
 db.flush()
@@ -246,5 +238,6 @@ for row in normal_raw + susp_raw + crit_raw:
     lg = AccessLog(**row)
     db.add(lg)
 db.commit()
+rollups.backfill(db)
 db.close()
 print("Realistic Medical Seed Complete: 200 patients with diagnoses, medications, and treatments.")
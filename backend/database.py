@@ -1,11 +1,114 @@
-from sqlalchemy import create_engine
+import asyncio
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.util import await_only
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from backend.config import DB_URL
+from backend.config import (
+    DB_PATH, DB_URL, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, READ_POOL_SIZE, READ_POOL_OVERFLOW,
+)
+WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+write_lock = threading.Lock()
+_gate = None
+_gate_loop = None
+def _tune(dbapi_conn, readonly=False):
+    cur = dbapi_conn.cursor()
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if not readonly:
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cur.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    if readonly:
+        cur.execute("PRAGMA query_only=1")
+    cur.close()
 engine = create_engine(
     DB_URL,
     connect_args={"check_same_thread": False}
 )
+read_engine = create_engine(
+    f"sqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    connect_args={"check_same_thread": False},
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_OVERFLOW,
+)
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{DB_PATH}",
+    poolclass=AsyncAdaptedQueuePool,
+)
+async_read_engine = create_async_engine(
+    f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true",
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_OVERFLOW,
+)
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _tune_writer(dbapi_conn, record):
+    _tune(dbapi_conn)
+@event.listens_for(read_engine, "connect")
+@event.listens_for(async_read_engine.sync_engine, "connect")
+def _tune_reader(dbapi_conn, record):
+    _tune(dbapi_conn, readonly=True)
+def _is_write(statement):
+    return statement.lstrip()[:7].upper().startswith(WRITE_VERBS)
+def _loop_gate():
+    global _gate, _gate_loop
+    loop = asyncio.get_running_loop()
+    if _gate_loop is not loop:
+        _gate_loop = loop
+        _gate = asyncio.Lock()
+    return _gate
+async def _acquire_async():
+    # async writers queue on the loop, and only the head of the queue waits for write_lock in a thread
+    gate = _loop_gate()
+    await gate.acquire()
+    try:
+        if not write_lock.acquire(blocking=False):
+            waiter = asyncio.get_running_loop().run_in_executor(None, write_lock.acquire)
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                waiter.add_done_callback(lambda _: write_lock.release())
+                raise
+    except BaseException:
+        gate.release()
+        raise
+    return gate
+def _release(info):
+    if info.pop("writing", False):
+        write_lock.release()
+        gate = info.pop("gate", None)
+        if gate is not None:
+            gate.release()
+@event.listens_for(engine, "before_cursor_execute")
+def _serialize_writes(conn, cursor, statement, parameters, context, executemany):
+    if not conn.info.get("writing") and _is_write(statement):
+        write_lock.acquire()
+        conn.info["writing"] = True
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _serialize_async_writes(conn, cursor, statement, parameters, context, executemany):
+    if not conn.info.get("writing") and _is_write(statement):
+        conn.info["gate"] = await_only(_acquire_async())
+        conn.info["writing"] = True
+@event.listens_for(engine, "commit")
+@event.listens_for(async_engine.sync_engine, "commit")
+def _after_commit(conn):
+    _release(conn.info)
+@event.listens_for(engine, "rollback")
+@event.listens_for(async_engine.sync_engine, "rollback")
+def _after_rollback(conn):
+    _release(conn.info)
+@event.listens_for(engine.pool, "checkin")
+@event.listens_for(async_engine.sync_engine.pool, "checkin")
+def _after_checkin(dbapi_conn, record):
+    _release(record.info)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSession = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+AsyncReadSession = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 def get_db():
     db = SessionLocal()
@@ -13,3 +116,15 @@ def get_db():
         yield db
     finally:
         db.close()
+def get_read_db():
+    db = ReadSession()
+    try:
+        yield db
+    finally:
+        db.close()
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+async def get_async_read_db():
+    async with AsyncReadSession() as db:
+        yield db
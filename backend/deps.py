@@ -1,16 +1,17 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from backend.database import get_db
+from backend.database import get_read_db
 from backend.auth import decode_token
 from backend.models import User
+from backend.principals import principals
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
     payload = decode_token(token)
     uid = payload.get("sub")
     if not uid:
         raise HTTPException(status_code=401, detail="invalid token")
-    user = db.query(User).filter(User.id == int(uid)).first()
+    user = principals.get(db, int(uid))
     if not user:
         raise HTTPException(status_code=401, detail="user not found")
     if user.is_locked:
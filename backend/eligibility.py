@@ -0,0 +1,123 @@
+import json
+from bisect import bisect_right
+import numpy as np
+from sqlalchemy import or_
+from backend.models import Patient, PatientScheme, SchemeMapping
+from backend import schemes
+from backend.cache import SharedEpoch
+from backend.config import HOSPITAL_STATE, ELIGIBILITY_EPOCH_FILE
+class Rule:
+    __slots__ = ("scheme_id", "name", "state", "min_age", "max_age", "flags")
+    def __init__(self, scheme_id, name, state, criteria):
+        c = json.loads(criteria) if criteria else {}
+        self.scheme_id = scheme_id
+        self.name = name
+        self.state = state
+        self.min_age = c.pop("min_age", 0)
+        self.max_age = c.pop("max_age", 999)
+        self.flags = c
+    def applies_to(self, state):
+        return self.state in ("ALL", state)
+def load_rules(db):
+    return [
+        Rule(s.id, s.scheme_name, s.state, s.eligibility_criteria)
+        for s in db.query(SchemeMapping).order_by(SchemeMapping.id)
+    ]
+def rules_from_list(schemes):
+    return [Rule(None, s["scheme_name"], s["state"], s["eligibility_criteria"]) for s in schemes]
+class _StateIndex:
+    def __init__(self, rules):
+        self.bounds = sorted({r.min_age for r in rules} | {r.max_age + 1 for r in rules})
+        self.table = []
+        for lo in self.bounds:
+            hits = [r for r in rules if r.min_age <= lo <= r.max_age]
+            plain = tuple(sorted({r.name for r in hits if not r.flags}))
+            flagged = tuple((r.name, r.flags) for r in hits if r.flags)
+            self.table.append((plain, flagged))
+        self.np_bounds = np.asarray(self.bounds, dtype=float)
+    def lookup(self, age, attrs=None):
+        i = bisect_right(self.bounds, age) - 1
+        if i < 0:
+            return []
+        return _resolve(self.table[i], attrs)
+def _resolve(entry, attrs):
+    plain, flagged = entry
+    if not flagged:
+        return list(plain)
+    names = set(plain)
+    for name, flags in flagged:
+        if attrs is None or all(attrs.get(k, v) == v for k, v in flags.items()):
+            names.add(name)
+    return sorted(names)
+class EligibilityEngine:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.names = {r.name for r in self.rules}
+        self._states = {}
+    def _index(self, state):
+        idx = self._states.get(state)
+        if idx is None:
+            idx = _StateIndex([r for r in self.rules if r.applies_to(state)])
+            self._states[state] = idx
+        return idx
+    def evaluate(self, age, state=HOSPITAL_STATE, attrs=None):
+        return self._index(state).lookup(age, attrs)
+    def evaluate_many(self, ages, state=HOSPITAL_STATE):
+        idx = self._index(state)
+        if not idx.bounds:
+            return [[] for _ in range(len(ages))]
+        pos = np.searchsorted(idx.np_bounds, np.asarray(ages, dtype=float), side="right") - 1
+        out = []
+        for i in pos:
+            out.append(_resolve(idx.table[i], None) if i >= 0 else [])
+        return out
+_engine = None
+_epoch = SharedEpoch(ELIGIBILITY_EPOCH_FILE)
+def get_engine(db):
+    global _engine
+    if _epoch.changed() or _engine is None:
+        _engine = EligibilityEngine(load_rules(db))
+    return _engine
+def invalidate():
+    global _engine
+    _engine = None
+    _epoch.bump()
+def recompute(db, ranges, extra_names=(), state=HOSPITAL_STATE, chunk=1000):
+    if not ranges:
+        return 0, set()
+    engine = get_engine(db)
+    managed = engine.names | set(extra_names)
+    ids = schemes.scheme_ids(db, state)
+    q = db.query(Patient.id, Patient.age, Patient.ward, Patient.assigned_doctor_id).filter(
+        or_(*[Patient.age.between(lo, hi) for lo, hi in ranges])
+    ).order_by(Patient.id)
+    changed = 0
+    states = set()
+    rows = q.all()
+    for i in range(0, len(rows), chunk):
+        part = rows[i:i + chunk]
+        wanted = engine.evaluate_many([r.age if r.age is not None else -1 for r in part], state)
+        current = {}
+        for pid, name in db.query(PatientScheme.patient_id, PatientScheme.scheme_name).filter(
+            PatientScheme.patient_id.in_([r.id for r in part]), PatientScheme.scheme_name.in_(managed)
+        ):
+            current.setdefault(pid, set()).add(name)
+        add = []
+        drop = []
+        for r, names in zip(part, wanted):
+            have = current.get(r.id, set())
+            new = set(names)
+            if have == new:
+                continue
+            changed += 1
+            states.add((r.ward, r.assigned_doctor_id))
+            drop.extend((r.id, n) for n in have - new)
+            add.extend({"patient_id": r.id, "scheme_name": n, "scheme_id": ids.get(n)} for n in new - have)
+        for pid, name in drop:
+            db.query(PatientScheme).filter(
+                PatientScheme.patient_id == pid, PatientScheme.scheme_name == name
+            ).delete(synchronize_session=False)
+        if add:
+            db.execute(PatientScheme.__table__.insert(), add)
+    db.commit()
+    return changed, states
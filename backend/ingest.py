@@ -0,0 +1,4 @@
+def error_text(e):
+    if hasattr(e, "errors"):
+        return "; ".join(f"{'.'.join(str(p) for p in er['loc'])}: {er['msg']}" for er in e.errors())
+    return str(e)
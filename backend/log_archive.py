@@ -0,0 +1,155 @@
+import os
+import json
+import gzip
+import heapq
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from backend.models import AccessLog
+from backend.config import LOG_RETENTION_DAYS, LOG_ARCHIVE_DIR, LOG_ARCHIVE_PARTITION, LOG_ARCHIVE_BLOCK_ROWS
+COLUMNS = ["id", "user_id", "patient_id", "action", "resource", "ip_address", "timestamp", "anomaly_score", "flagged"]
+PREFIX = "access_logs_"
+SUFFIX = ".json.gz"
+def _partition_key(ts, granularity=LOG_ARCHIVE_PARTITION):
+    return ts.strftime("%Y-%m-%d" if granularity == "day" else "%Y-%m")
+def _partition_range(key):
+    if len(key) == 10:
+        start = datetime.strptime(key, "%Y-%m-%d")
+        return start, start + timedelta(days=1)
+    start = datetime.strptime(key, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+def _path(key, archive_dir=LOG_ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"{PREFIX}{key}{SUFFIX}")
+def partitions(archive_dir=LOG_ARCHIVE_DIR):
+    if not os.path.isdir(archive_dir):
+        return []
+    keys = [
+        f[len(PREFIX):-len(SUFFIX)] for f in os.listdir(archive_dir)
+        if f.startswith(PREFIX) and f.endswith(SUFFIX)
+    ]
+    return sorted(keys)
+def _blocks(key, archive_dir=LOG_ARCHIVE_DIR):
+    path = _path(key, archive_dir)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            cols = json.loads(line)["columns"]
+            cols["timestamp"] = [datetime.fromisoformat(t) for t in cols["timestamp"]]
+            yield cols
+def partition_rows(key, archive_dir=LOG_ARCHIVE_DIR):
+    for cols in _blocks(key, archive_dir):
+        for i in range(len(cols["id"])):
+            yield {c: cols[c][i] for c in COLUMNS}
+def _write_block(f, key, block):
+    cols = {c: [r[c] for r in block] for c in COLUMNS}
+    cols["timestamp"] = [t.isoformat() for t in cols["timestamp"]]
+    f.write(json.dumps({"partition": key, "rows": len(block), "columns": cols}, separators=(",", ":")) + "\n")
+def _write_partition(key, rows, archive_dir=LOG_ARCHIVE_DIR):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = _path(key, archive_dir)
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt") as f:
+        block = []
+        for r in rows:
+            block.append(r)
+            if len(block) >= LOG_ARCHIVE_BLOCK_ROWS:
+                _write_block(f, key, block)
+                block = []
+        if block:
+            _write_block(f, key, block)
+    os.replace(tmp, path)
+def _merge(key, rows, archive_dir=LOG_ARCHIVE_DIR):
+    order = lambda r: (r["timestamp"], r["id"])
+    def merged():
+        last = None
+        for r in heapq.merge(partition_rows(key, archive_dir), rows, key=order):
+            if r["id"] != last:
+                last = r["id"]
+                yield r
+    _write_partition(key, merged(), archive_dir)
+def roll_over(db, older_than_days=LOG_RETENTION_DAYS, granularity=LOG_ARCHIVE_PARTITION, archive_dir=LOG_ARCHIVE_DIR):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    cols = [getattr(AccessLog, c) for c in COLUMNS]
+    archived = 0
+    written = []
+    while True:
+        first = db.query(func.min(AccessLog.timestamp)).filter(AccessLog.timestamp < cutoff).scalar()
+        if first is None:
+            break
+        key = _partition_key(first, granularity)
+        start, end = _partition_range(key)
+        window = (AccessLog.timestamp >= start, AccessLog.timestamp < min(end, cutoff))
+        count, top = db.query(func.count(AccessLog.id), func.max(AccessLog.id)).filter(*window).one()
+        hot = (
+            db.query(*cols).filter(*window, AccessLog.id <= top)
+            .order_by(AccessLog.timestamp, AccessLog.id)
+            .yield_per(LOG_ARCHIVE_BLOCK_ROWS)
+        )
+        _merge(key, (dict(zip(COLUMNS, r)) for r in hot), archive_dir)
+        db.query(AccessLog).filter(*window, AccessLog.id <= top).delete(synchronize_session=False)
+        db.commit()
+        archived += count
+        written.append(key)
+    return {"archived": archived, "partitions": written, "cutoff": cutoff.isoformat()}
+def _matching(cols, from_dt, to_dt, user_id, action, flagged, user_ids, patient_ids):
+    hits = []
+    for i in range(len(cols["id"])):
+        ts = cols["timestamp"][i]
+        if from_dt and ts < from_dt:
+            continue
+        if to_dt and ts > to_dt:
+            continue
+        if user_id is not None and cols["user_id"][i] != user_id:
+            continue
+        if user_ids is not None and cols["user_id"][i] not in user_ids:
+            continue
+        if patient_ids is not None and cols["patient_id"][i] not in patient_ids:
+            continue
+        if action and cols["action"][i] != action:
+            continue
+        if flagged is not None and cols["flagged"][i] != flagged:
+            continue
+        hits.append({c: cols[c][i] for c in COLUMNS})
+    return hits
+def iter_archived(from_dt=None, to_dt=None, user_id=None, action=None, flagged=None,
+                  user_ids=None, patient_ids=None, newest_first=False, tail=None, archive_dir=LOG_ARCHIVE_DIR):
+    keys = partitions(archive_dir)
+    if newest_first:
+        keys = keys[::-1]
+    for key in keys:
+        start, end = _partition_range(key)
+        if (from_dt and end <= from_dt) or (to_dt and start > to_dt):
+            continue
+        newest = deque(maxlen=tail)
+        for cols in _blocks(key, archive_dir):
+            hits = _matching(cols, from_dt, to_dt, user_id, action, flagged, user_ids, patient_ids)
+            if newest_first:
+                newest.extend(hits)
+            elif hits:
+                yield hits
+        if newest:
+            yield list(reversed(newest))
+def read_archived(limit=None, **filters):
+    out = []
+    for hits in iter_archived(tail=limit, **filters):
+        out.extend(hits)
+        if limit is not None and len(out) >= limit:
+            return out[:limit]
+    return out
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+    parser = argparse.ArgumentParser(description="Roll old access logs into compressed archive partitions")
+    parser.add_argument("--days", type=int, default=LOG_RETENTION_DAYS)
+    parser.add_argument("--partition", choices=["day", "month"], default=LOG_ARCHIVE_PARTITION)
+    args = parser.parse_args()
+    db = SessionLocal()
+    try:
+        result = roll_over(db, older_than_days=args.days, granularity=args.partition)
+    finally:
+        db.close()
+    print(f"Archived {result['archived']} logs older than {result['cutoff']} into {len(result['partitions'])} partitions → {LOG_ARCHIVE_DIR}")
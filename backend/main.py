@@ -1,6 +1,8 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from backend.database import engine, Base
+from backend.database import engine, async_engine, async_read_engine
+from backend.migrations import migrate
+from backend.audit_writer import audit_writer
 from backend.routers import (
     auth_router,
     users_router,
@@ -8,8 +10,9 @@ from backend.routers import (
     logs_router,
     alerts_router,
     agents_router,
+    schemes_router,
 )
-Base.metadata.create_all(bind=engine)
+migrate(engine)
 app = FastAPI(title="SecureHealth AI")
 app.add_middleware(
     CORSMiddleware,
@@ -38,12 +41,23 @@ class WSManager:
             self.disconnect(ws)
 ws_manager = WSManager()
 app.state.ws_manager = ws_manager
+@app.on_event("startup")
+async def start_audit_writer():
+    await audit_writer.start()
+@app.on_event("shutdown")
+async def stop_audit_writer():
+    await audit_writer.stop()
+@app.on_event("shutdown")
+async def dispose_async_engines():
+    await async_engine.dispose()
+    await async_read_engine.dispose()
 app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
 app.include_router(users_router.router, prefix="/users", tags=["users"])
 app.include_router(patients_router.router, prefix="/patients", tags=["patients"])
 app.include_router(logs_router.router, prefix="/logs", tags=["logs"])
 app.include_router(alerts_router.router, prefix="/alerts", tags=["alerts"])
 app.include_router(agents_router.router, prefix="/agents", tags=["agents"])
+app.include_router(schemes_router.router, prefix="/schemes", tags=["schemes"])
 @app.websocket("/ws/alerts")
 async def ws_alerts(ws: WebSocket):
     await ws_manager.connect(ws)
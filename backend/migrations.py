@@ -0,0 +1,68 @@
+from sqlalchemy import text
+from backend.models import Base
+from backend.search import ensure_fts
+from backend.versions import ensure_versions
+HOT_PATH_INDEXES = [
+    ("ix_access_logs_timestamp", "access_logs", "timestamp"),
+    ("ix_access_logs_user_ts", "access_logs", "user_id, timestamp"),
+    ("ix_access_logs_patient_ts", "access_logs", "patient_id, timestamp"),
+    ("ix_alerts_resolved_created", "alerts", "resolved, created_at"),
+    ("ix_alerts_created_at", "alerts", "created_at"),
+    ("ix_alerts_user_id", "alerts", "user_id"),
+    ("ix_patients_doctor_ward", "patients", "assigned_doctor_id, ward"),
+    ("ix_agent_commands_agent_created", "agent_commands", "agent, created_at"),
+    ("ix_agent_commands_created_at", "agent_commands", "created_at"),
+    ("ix_activity_rollups_hour", "activity_rollups", "hour"),
+    ("ix_activity_rollup_members_hour", "activity_rollup_members", "hour"),
+]
+SUPERSEDED_INDEXES = ["ix_patients_assigned_doctor_id"]
+def _baseline(conn):
+    Base.metadata.create_all(bind=conn)
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=conn, checkfirst=True)
+def _supervisor_column(conn):
+    cols = [r[1] for r in conn.execute(text("PRAGMA table_info(users)"))]
+    if "supervising_doctor_id" not in cols:
+        conn.execute(text("ALTER TABLE users ADD COLUMN supervising_doctor_id INTEGER REFERENCES users(id)"))
+def _scheme_links(conn):
+    from backend.data.migrate_schemes import migrate_scheme_eligibility
+    migrate_scheme_eligibility(conn)
+def _hot_path_indexes(conn):
+    for name, table, cols in HOT_PATH_INDEXES:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})"))
+    for name in SUPERSEDED_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+def _rollup_columns(conn):
+    cols = [r[1] for r in conn.execute(text("PRAGMA table_info(activity_rollups)"))]
+    for col in ("distinct_patients", "distinct_ips"):
+        if col in cols:
+            conn.execute(text(f"ALTER TABLE activity_rollups DROP COLUMN {col}"))
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "users.supervising_doctor_id", _supervisor_column),
+    (3, "patients full-text index", ensure_fts),
+    (4, "table and scope version triggers", ensure_versions),
+    (5, "patient_schemes from legacy scheme_eligible", _scheme_links),
+    (6, "hot-path indexes", _hot_path_indexes),
+    (7, "drop stored rollup distinct counts", _rollup_columns),
+]
+LATEST = MIGRATIONS[-1][0]
+def schema_version(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar()
+def migrate(engine, target=LATEST):
+    current = schema_version(engine)
+    for version, name, step in MIGRATIONS:
+        if current < version <= target:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(text(f"PRAGMA user_version = {version}"))
+            print(f"schema migrated to v{version}: {name}")
+            current = version
+    return current
+if __name__ == "__main__":
+    from backend.database import engine
+    before = schema_version(engine)
+    after = migrate(engine)
+    print(f"schema at v{after} (was v{before})")
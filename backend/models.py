@@ -24,16 +24,31 @@ class Patient(Base):
     __tablename__ = "patients"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    age = Column(Integer)
-    ward = Column(String)
+    age = Column(Integer, index=True)
+    ward = Column(String, index=True)
     assigned_doctor_id = Column(Integer, ForeignKey("users.id"))
-    scheme_eligible = Column(Text)
-    risk_score = Column(Float, default=0.0)
-    diagnosis = Column(String, nullable=True)
+    risk_score = Column(Float, default=0.0, index=True)
+    diagnosis = Column(String, nullable=True, index=True)
     medical_records = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     doctor = relationship("User", foreign_keys=[assigned_doctor_id])
     logs = relationship("AccessLog", back_populates="patient")
+    schemes = relationship(
+        "PatientScheme",
+        back_populates="patient",
+        cascade="all, delete-orphan",
+        order_by="PatientScheme.scheme_name",
+    )
+    @property
+    def scheme_names(self):
+        return [s.scheme_name for s in self.schemes]
+class PatientScheme(Base):
+    __tablename__ = "patient_schemes"
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), primary_key=True)
+    scheme_name = Column(String, primary_key=True, index=True)
+    scheme_id = Column(Integer, ForeignKey("scheme_mappings.id"), nullable=True)
+    patient = relationship("Patient", back_populates="schemes")
+    scheme = relationship("SchemeMapping")
 class AccessLog(Base):
     __tablename__ = "access_logs"
     id = Column(Integer, primary_key=True, index=True)
@@ -47,6 +62,21 @@ class AccessLog(Base):
     flagged = Column(Integer, default=0)
     user = relationship("User", back_populates="logs", foreign_keys=[user_id])
     patient = relationship("Patient", back_populates="logs")
+class ActivityRollup(Base):
+    __tablename__ = "activity_rollups"
+    user_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    action = Column(String, primary_key=True)
+    resource = Column(String, primary_key=True)
+    event_count = Column(Integer, default=0)
+class ActivityRollupMember(Base):
+    __tablename__ = "activity_rollup_members"
+    user_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, primary_key=True)
+    action = Column(String, primary_key=True)
+    resource = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
 class Alert(Base):
     __tablename__ = "alerts"
     id = Column(Integer, primary_key=True, index=True)
@@ -0,0 +1,44 @@
+from sqlalchemy.orm import aliased
+from backend.models import User
+from backend.cache import SharedEpoch, TTLCache
+from backend.config import PRINCIPAL_TTL, PRINCIPAL_CACHE_SIZE, PRINCIPAL_EPOCH_FILE
+class Principal:
+    __slots__ = (
+        "id", "name", "email", "role", "department", "specialization",
+        "supervising_doctor_id", "supervising_doctor_name", "is_locked", "created_at",
+    )
+    def __init__(self, **fields):
+        for k in self.__slots__:
+            setattr(self, k, fields.get(k))
+_Supervisor = aliased(User)
+_COLUMNS = (
+    User.id, User.name, User.email, User.role, User.department, User.specialization,
+    User.supervising_doctor_id, _Supervisor.name.label("supervising_doctor_name"), User.is_locked, User.created_at,
+)
+class PrincipalCache:
+    def __init__(self, ttl=PRINCIPAL_TTL, maxsize=PRINCIPAL_CACHE_SIZE, epoch_file=PRINCIPAL_EPOCH_FILE):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._epoch = SharedEpoch(epoch_file)
+    def get(self, db, uid):
+        if self._epoch.changed():
+            self._cache.clear()
+        principal = self._cache.get(uid)
+        if principal is None:
+            row = (
+                db.query(*_COLUMNS)
+                .outerjoin(_Supervisor, _Supervisor.id == User.supervising_doctor_id)
+                .filter(User.id == uid)
+                .first()
+            )
+            if row is None:
+                return None
+            principal = Principal(**row._asdict())
+            self._cache.set(uid, principal)
+        return principal
+    def invalidate(self, uid=None):
+        if uid is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(uid)
+        self._epoch.bump()
+principals = PrincipalCache()
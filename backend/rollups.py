@@ -0,0 +1,103 @@
+import argparse
+from collections import Counter
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from backend.models import AccessLog, ActivityRollup, ActivityRollupMember
+from backend.log_archive import iter_archived
+KEY_COLS = ["user_id", "hour", "action", "resource"]
+def _val(r, k):
+    return r[k] if isinstance(r, dict) else getattr(r, k)
+def record(db, rows):
+    counts = Counter()
+    members = set()
+    for r in rows:
+        ts = _val(r, "timestamp")
+        key = (_val(r, "user_id"), ts.replace(minute=0, second=0, microsecond=0), _val(r, "action"), _val(r, "resource"))
+        counts[key] += 1
+        if _val(r, "patient_id") is not None:
+            members.add(key + ("patient", str(_val(r, "patient_id"))))
+        if _val(r, "ip_address"):
+            members.add(key + ("ip", _val(r, "ip_address")))
+    if not counts:
+        return
+    stmt = insert(ActivityRollup)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=KEY_COLS,
+            set_={"event_count": ActivityRollup.event_count + stmt.excluded.event_count},
+        ),
+        [dict(zip(KEY_COLS, k), event_count=n) for k, n in counts.items()],
+    )
+    if members:
+        db.execute(
+            insert(ActivityRollupMember).on_conflict_do_nothing(),
+            [dict(zip(KEY_COLS + ["kind", "value"], m)) for m in members],
+        )
+def backfill(db, chunk=10000):
+    db.query(ActivityRollupMember).delete()
+    db.query(ActivityRollup).delete()
+    for hits in iter_archived():
+        for i in range(0, len(hits), chunk):
+            record(db, hits[i:i + chunk])
+    cols = [AccessLog.user_id, AccessLog.patient_id, AccessLog.action, AccessLog.resource, AccessLog.ip_address, AccessLog.timestamp]
+    batch = []
+    total = 0
+    for row in db.query(*cols).execution_options(yield_per=chunk):
+        batch.append(row._asdict())
+        if len(batch) >= chunk:
+            record(db, batch)
+            total += len(batch)
+            batch = []
+    record(db, batch)
+    total += len(batch)
+    db.commit()
+    return total
+def series(db, from_dt, to_dt, user_id=None, action=None, resource=None, bucket="hour"):
+    def bucketed(model):
+        return model.hour if bucket == "hour" else func.date(model.hour)
+    def scoped(q, model):
+        q = q.filter(model.hour >= from_dt.replace(minute=0, second=0, microsecond=0), model.hour <= to_dt)
+        if user_id is not None:
+            q = q.filter(model.user_id == user_id)
+        if action:
+            q = q.filter(model.action == action)
+        if resource:
+            q = q.filter(model.resource == resource)
+        return q
+    b = bucketed(ActivityRollup).label("bucket")
+    counts = scoped(
+        db.query(b, ActivityRollup.action, func.sum(ActivityRollup.event_count)),
+        ActivityRollup,
+    ).group_by(b, ActivityRollup.action).all()
+    mb = bucketed(ActivityRollupMember).label("bucket")
+    distinct = {
+        (bk, act, kind): n for bk, act, kind, n in scoped(
+            db.query(mb, ActivityRollupMember.action, ActivityRollupMember.kind, func.count(func.distinct(ActivityRollupMember.value))),
+            ActivityRollupMember,
+        ).group_by(mb, ActivityRollupMember.action, ActivityRollupMember.kind)
+    }
+    out = []
+    for bk, act, n in sorted(counts, key=lambda r: (str(r[0]), r[1])):
+        out.append({
+            "bucket": bk.isoformat() if hasattr(bk, "isoformat") else bk,
+            "action": act,
+            "count": int(n),
+            "distinct_patients": distinct.get((bk, act, "patient"), 0),
+            "distinct_ips": distinct.get((bk, act, "ip"), 0),
+        })
+    return out
+if __name__ == "__main__":
+    from backend.database import SessionLocal, engine, Base
+    parser = argparse.ArgumentParser(description="Maintain per-user hourly activity rollups")
+    parser.add_argument("--backfill", action="store_true", help="rebuild rollups from the hot table and archives")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        raise SystemExit(1)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        n = backfill(db)
+    finally:
+        db.close()
+    print(f"Rollups rebuilt from {n} hot log rows (plus archives).")
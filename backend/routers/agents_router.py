@@ -1,8 +1,11 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
-from backend.database import get_db
+from backend.database import get_async_read_db, get_read_db
 from backend.models import AgentCommand, User
 from backend.deps import require_admin, require_doctor_or_admin
 router = APIRouter()
@@ -23,18 +26,18 @@ def fmt_cmd(c: AgentCommand):
         "created_at": c.created_at,
     }
 @router.post("/threat-hunter/scan")
-async def th_scan(body: ScanBody, request: Request, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+async def th_scan(body: ScanBody, request: Request, db: AsyncSession = Depends(get_async_read_db), admin: User = Depends(require_admin)):
     from backend.agents.threat_hunter import scan
     mgr = request.app.state.ws_manager
     result = await scan(db, ward_filter=body.ward, user_name_filter=body.user_name, triggered_by_id=admin.id, ws_manager=mgr)
     return result
 @router.post("/threat-hunter/voice")
-async def th_voice(body: VoiceBody, request: Request, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+async def th_voice(body: VoiceBody, request: Request, db: AsyncSession = Depends(get_async_read_db), admin: User = Depends(require_admin)):
     from backend.agents.threat_hunter import parse_voice_command, scan, lock_user
     mgr = request.app.state.ws_manager
     cmd = parse_voice_command(body.transcript)
     if cmd["action"] == "lock" and cmd.get("user_id"):
-        result = await lock_user(db, cmd["user_id"], admin.id, mgr)
+        result = await lock_user(cmd["user_id"], admin.id, mgr)
     else:
         result = await scan(
             db,
@@ -45,7 +48,7 @@ async def th_voice(body: VoiceBody, request: Request, db: Session = Depends(get_
         )
     return {"transcript": body.transcript, "parsed": cmd, "result": result}
 @router.get("/threat-hunter/status")
-def th_status(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+def th_status(db: Session = Depends(get_read_db), _: User = Depends(require_admin)):
     last = (
         db.query(AgentCommand)
         .filter(AgentCommand.agent == "threat_hunter")
@@ -56,15 +59,32 @@ def th_status(db: Session = Depends(get_db), _: User = Depends(require_admin)):
         return {"status": "no scans yet"}
     return fmt_cmd(last)
 @router.post("/privacy-query/ask")
-def pq_ask(body: QueryBody, db: Session = Depends(get_db), user: User = Depends(require_doctor_or_admin)):
+async def pq_ask(body: QueryBody, db: AsyncSession = Depends(get_async_read_db), user: User = Depends(require_doctor_or_admin)):
     from backend.agents.privacy_query import ask
-    return ask(db, body.question, user)
+    return await ask(db, body.question, user)
 @router.post("/privacy-query/voice")
-def pq_voice(body: VoiceBody, db: Session = Depends(get_db), user: User = Depends(require_doctor_or_admin)):
+async def pq_voice(body: VoiceBody, db: AsyncSession = Depends(get_async_read_db), user: User = Depends(require_doctor_or_admin)):
     from backend.agents.privacy_query import ask
-    result = ask(db, body.transcript, user)
+    result = await ask(db, body.transcript, user)
     return {"transcript": body.transcript, "result": result}
+def _sse(events):
+    async def body():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+@router.post("/privacy-query/ask/stream")
+async def pq_ask_stream(body: QueryBody, db: AsyncSession = Depends(get_async_read_db), user: User = Depends(require_doctor_or_admin)):
+    from backend.agents.privacy_query import ask_stream, prepare
+    return _sse(ask_stream(await prepare(db, body.question, user)))
+@router.post("/privacy-query/voice/stream")
+async def pq_voice_stream(body: VoiceBody, db: AsyncSession = Depends(get_async_read_db), user: User = Depends(require_doctor_or_admin)):
+    from backend.agents.privacy_query import ask_stream, prepare
+    return _sse(ask_stream(await prepare(db, body.transcript, user)))
 @router.get("/commands")
-def command_history(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+def command_history(db: Session = Depends(get_read_db), _: User = Depends(require_admin)):
     rows = db.query(AgentCommand).order_by(AgentCommand.created_at.desc()).limit(100).all()
     return [fmt_cmd(r) for r in rows]
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session, joinedload
+from backend.database import get_db, get_read_db
 from backend.models import Alert, User
 from backend.deps import require_admin
+from backend.versions import etag, matches, not_modified, tag_response, versions
 router = APIRouter()
 def fmt(a: Alert):
     return {
@@ -17,9 +18,14 @@ def fmt(a: Alert):
         "created_at": a.created_at,
     }
 @router.get("/")
-def list_alerts(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+def list_alerts(request: Request, response: Response, db: Session = Depends(get_read_db), _: User = Depends(require_admin)):
+    tag = etag("alerts", versions(db, "alerts", "users"))
+    if matches(request, tag):
+        return not_modified(tag)
+    tag_response(response, tag)
     rows = (
         db.query(Alert)
+        .options(joinedload(Alert.user).load_only(User.name))
         .filter(Alert.resolved == 0)
         .order_by(Alert.created_at.desc())
         .all()
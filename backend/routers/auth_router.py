@@ -1,53 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from datetime import datetime
 import json
-from backend.database import get_db
+from backend import rollups
+from backend.database import get_async_db
 from backend.models import User, AccessLog, Alert
-from backend.auth import verify_password, create_token
+from backend.auth import verify_password_async, create_token
 from backend.deps import get_current_user
+from backend.sessions import session_tracker
 router = APIRouter()
 @router.post("/login")
-async def login(request: Request, form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form.username).first()
-    if not user or not verify_password(form.password, user.password_hash):
+async def login(request: Request, form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    cred = (await db.execute(select(User.id, User.password_hash).where(User.email == form.username))).first()
+    await db.rollback()  # hand the pooled connection back while bcrypt runs off-loop
+    if not cred or not await verify_password_async(form.password, cred.password_hash):
+        raise HTTPException(status_code=401, detail="invalid credentials")
+    user = await db.get(User, cred.id, options=[selectinload(User.supervisor)])
+    if not user:
         raise HTTPException(status_code=401, detail="invalid credentials")
     if user.is_locked:
         raise HTTPException(status_code=403, detail="account locked")
     current_ip = request.client.host if request.client else "unknown"
-    if user.role == "doctor":
-        cutoff = datetime.utcnow() - timedelta(hours=1)
-        recent_logins = db.query(AccessLog).filter(
-            AccessLog.user_id == user.id,
-            AccessLog.action == "LOGIN",
-            AccessLog.timestamp >= cutoff
-        ).all()
-        for log in recent_logins:
-            if log.ip_address != current_ip and log.ip_address not in ("unknown", "127.0.0.1", "::1", "localhost"):
-                alert = Alert(
-                    user_id=user.id,
-                    alert_type="concurrent_ip_login",
-                    severity="high",
-                    details=json.dumps({"msg": "Concurrent Multi-IP Login Detected", "prior_ip": log.ip_address, "current_ip": current_ip}),
-                    resolved=0,
-                    auto_locked=0  # Just mark as an active alert, do not lock out
-                )
-                db.add(alert)
-                db.flush()
-                mgr = getattr(request.app.state, 'ws_manager', None)
-                if mgr:
-                    await mgr.broadcast({
-                        "event": "new_alert",
-                        "alert_id": alert.id,
-                        "user_id": user.id,
-                        "user_name": user.name,
-                        "severity": "high",
-                        "anomaly_score": 0.8,
-                        "auto_locked": 0,
-                        "created_at": alert.created_at.isoformat() if alert.created_at else datetime.utcnow().isoformat()
-                    })
-                break
     log_entry = AccessLog(
         user_id=user.id,
         action="LOGIN",
@@ -56,10 +32,34 @@ async def login(request: Request, form: OAuth2PasswordRequestForm = Depends(), d
         anomaly_score=0.0
     )
     db.add(log_entry)
-    db.commit()
-    db.refresh(log_entry)
+    await db.flush()
+    prior_ip = await db.run_sync(session_tracker.record, log_entry)
+    alert = None
+    if prior_ip:
+        alert = Alert(
+            user_id=user.id,
+            alert_type="concurrent_ip_login",
+            severity="high",
+            details=json.dumps({"msg": "Concurrent Multi-IP Login Detected", "prior_ip": prior_ip, "current_ip": current_ip}),
+            resolved=0,
+            auto_locked=0  # Just mark as an active alert, do not lock out
+        )
+        db.add(alert)
+    await db.run_sync(rollups.record, [log_entry])
+    await db.commit()
     
     mgr = getattr(request.app.state, 'ws_manager', None)
+    if mgr and alert is not None:
+        await mgr.broadcast({
+            "event": "new_alert",
+            "alert_id": alert.id,
+            "user_id": user.id,
+            "user_name": user.name,
+            "severity": "high",
+            "anomaly_score": 0.8,
+            "auto_locked": 0,
+            "created_at": alert.created_at.isoformat() if alert.created_at else datetime.utcnow().isoformat()
+        })
     if mgr:
         await mgr.broadcast({
             "event": "patient_action",
@@ -97,5 +97,5 @@ def me(current: User = Depends(get_current_user)):
         "specialization": current.specialization,
         "is_locked": current.is_locked,
         "supervising_doctor_id": current.supervising_doctor_id,
-        "supervising_doctor_name": current.supervisor.name if current.supervisor else None,
+        "supervising_doctor_name": current.supervising_doctor_name,
     }
@@ -1,17 +1,38 @@
-from datetime import datetime
-from fastapi import APIRouter, Depends, Query, Request
+import io
+import csv
+import json
+import zlib
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 from typing import Optional
-from backend.database import get_db
-from backend.models import AccessLog, User
+from backend.database import get_async_db, get_db, get_read_db, ReadSession
+from backend.models import AccessLog, Patient, User
 from backend.deps import get_current_user, require_admin
+from backend import rollups
+from backend.ingest import error_text
+from backend.log_archive import iter_archived, read_archived, roll_over
+from backend.config import (
+    LOG_BATCH_MAX, LOG_BATCH_BROADCAST_SAMPLE, LOG_CLOCK_SKEW_SECONDS, EXPORT_CHUNK_ROWS, LOG_RETENTION_DAYS,
+)
 router = APIRouter()
 class LogCreate(BaseModel):
     patient_id: Optional[int] = None
     action: str
     resource: str
     ip_address: Optional[str] = "unknown"
+class BatchLogCreate(LogCreate):
+    user_id: Optional[int] = None
+    timestamp: Optional[datetime] = None
+LOG_OPTIONS = (
+    joinedload(AccessLog.user).load_only(User.name, User.role),
+    joinedload(AccessLog.patient).load_only(Patient.name),
+)
 def fmt(lg: AccessLog):
     return {
         "id": lg.id,
@@ -27,20 +48,59 @@ def fmt(lg: AccessLog):
         "anomaly_score": lg.anomaly_score,
         "flagged": lg.flagged,
     }
+def _hydrate(db, archived):
+    uids = {r["user_id"] for r in archived}
+    pids = {r["patient_id"] for r in archived if r["patient_id"] is not None}
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(uids))} if uids else {}
+    patients = {p.id: p for p in db.query(Patient).filter(Patient.id.in_(pids))} if pids else {}
+    return [
+        SimpleNamespace(**r, user=users.get(r["user_id"]), patient=patients.get(r["patient_id"]))
+        for r in archived
+    ]
+def _archive_filters(user_id=None, action=None, flagged=None, from_dt=None, to_dt=None):
+    return {
+        "user_id": user_id,
+        "action": action.upper() if action else None,
+        "flagged": flagged,
+        "from_dt": datetime.fromisoformat(from_dt) if from_dt else None,
+        "to_dt": datetime.fromisoformat(to_dt) if to_dt else None,
+    }
+def _with_archived(db, rows, limit, filters):
+    if len(rows) >= limit:
+        return rows
+    archived = read_archived(limit=limit, newest_first=True, **filters)
+    if not archived:
+        return rows
+    merged = sorted(rows + _hydrate(db, archived), key=lambda r: r.timestamp, reverse=True)
+    return merged[:limit]
 @router.get("/my")
 def my_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
     limit: int = Query(100, le=500),
 ):
     rows = (
         db.query(AccessLog)
+        .options(*LOG_OPTIONS)
         .filter(AccessLog.user_id == user.id)
         .order_by(AccessLog.timestamp.desc())
         .limit(limit)
         .all()
     )
+    rows = _with_archived(db, rows, limit, _archive_filters(user_id=user.id))
     return [fmt(r) for r in rows]
+def _filtered(q, user_id=None, action=None, flagged=None, from_dt=None, to_dt=None):
+    if user_id is not None:
+        q = q.filter(AccessLog.user_id == user_id)
+    if action:
+        q = q.filter(AccessLog.action == action.upper())
+    if flagged is not None:
+        q = q.filter(AccessLog.flagged == flagged)
+    if from_dt:
+        q = q.filter(AccessLog.timestamp >= datetime.fromisoformat(from_dt))
+    if to_dt:
+        q = q.filter(AccessLog.timestamp <= datetime.fromisoformat(to_dt))
+    return q
 def _dedup(rows):
     seen = []
     for r in rows:
@@ -57,9 +117,28 @@ def _dedup(rows):
         entry["count"] = 1
         seen.append(entry)
     return seen
+@router.get("/stats")
+def log_stats(
+    db: Session = Depends(get_read_db),
+    _: User = Depends(require_admin),
+    user_id: Optional[int] = Query(None),
+    action: Optional[str] = Query(None),
+    resource: Optional[str] = Query(None),
+    from_dt: Optional[str] = Query(None),
+    to_dt: Optional[str] = Query(None),
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+):
+    end = datetime.fromisoformat(to_dt) if to_dt else datetime.utcnow()
+    start = datetime.fromisoformat(from_dt) if from_dt else end - timedelta(days=7)
+    return {
+        "bucket": bucket,
+        "from_dt": start,
+        "to_dt": end,
+        "series": rollups.series(db, start, end, user_id, action.upper() if action else None, resource, bucket),
+    }
 @router.get("/")
 def all_logs(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     _: User = Depends(require_admin),
     user_id: Optional[int] = Query(None),
     action: Optional[str] = Query(None),
@@ -68,24 +147,117 @@ def all_logs(
     to_dt: Optional[str] = Query(None),
     limit: int = Query(100, le=1000),
 ):
-    q = db.query(AccessLog)
-    if user_id is not None:
-        q = q.filter(AccessLog.user_id == user_id)
-    if action:
-        q = q.filter(AccessLog.action == action.upper())
-    if flagged is not None:
-        q = q.filter(AccessLog.flagged == flagged)
-    if from_dt:
-        q = q.filter(AccessLog.timestamp >= datetime.fromisoformat(from_dt))
-    if to_dt:
-        q = q.filter(AccessLog.timestamp <= datetime.fromisoformat(to_dt))
+    q = _filtered(db.query(AccessLog).options(*LOG_OPTIONS), user_id, action, flagged, from_dt, to_dt)
     rows = q.order_by(AccessLog.timestamp.desc()).limit(limit).all()
+    rows = _with_archived(db, rows, limit, _archive_filters(user_id, action, flagged, from_dt, to_dt))
     return _dedup(rows)
+EXPORT_COLUMNS = [
+    "id", "user_id", "user_name", "user_role", "patient_id", "patient_name",
+    "action", "resource", "ip_address", "timestamp", "anomaly_score", "flagged",
+]
+def _export_rows(user_id, action, flagged, from_dt, to_dt):
+    db = ReadSession()
+    try:
+        for hits in iter_archived(**_archive_filters(user_id, action, flagged, from_dt, to_dt)):
+            users = _lookup(db, (User.id, User.name, User.role), User.id, {r["user_id"] for r in hits})
+            patients = _lookup(
+                db, (Patient.id, Patient.name), Patient.id,
+                {r["patient_id"] for r in hits if r["patient_id"] is not None},
+            )
+            for i in range(0, len(hits), EXPORT_CHUNK_ROWS):
+                part = []
+                for r in hits[i:i + EXPORT_CHUNK_ROWS]:
+                    u = users.get(r["user_id"])
+                    p = patients.get(r["patient_id"])
+                    part.append((
+                        r["id"], r["user_id"], u.name if u else None, u.role if u else None,
+                        r["patient_id"], p.name if p else None, r["action"], r["resource"],
+                        r["ip_address"], r["timestamp"], r["anomaly_score"], r["flagged"],
+                    ))
+                yield part
+        q = select(
+            AccessLog.id, AccessLog.user_id, User.name, User.role, AccessLog.patient_id, Patient.name,
+            AccessLog.action, AccessLog.resource, AccessLog.ip_address, AccessLog.timestamp,
+            AccessLog.anomaly_score, AccessLog.flagged,
+        ).outerjoin(User, User.id == AccessLog.user_id).outerjoin(Patient, Patient.id == AccessLog.patient_id)
+        q = _filtered(q, user_id, action, flagged, from_dt, to_dt).order_by(AccessLog.timestamp, AccessLog.id)
+        result = db.execute(q.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS))
+        for part in result.partitions():
+            yield part
+    finally:
+        db.close()
+def _encode_ndjson(parts):
+    for part in parts:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n" for row in part
+        ).encode()
+def _encode_csv(parts):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for part in parts:
+        writer.writerows(part)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+def _gzipped(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+@router.get("/export")
+def export_logs(
+    _: User = Depends(require_admin),
+    kind: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False),
+    user_id: Optional[int] = Query(None),
+    action: Optional[str] = Query(None),
+    flagged: Optional[int] = Query(None),
+    from_dt: Optional[str] = Query(None),
+    to_dt: Optional[str] = Query(None),
+):
+    for dt in (from_dt, to_dt):
+        if dt:
+            try:
+                datetime.fromisoformat(dt)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"invalid datetime: {dt}")
+    parts = _export_rows(user_id, action, flagged, from_dt, to_dt)
+    body = _encode_ndjson(parts) if kind == "ndjson" else _encode_csv(parts)
+    media_type = "application/x-ndjson" if kind == "ndjson" else "text/csv"
+    filename = f"access_logs.{kind}"
+    if gzip:
+        body = _gzipped(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+@router.post("/archive")
+def archive_logs(
+    db: Session = Depends(get_db),
+    _: User = Depends(require_admin),
+    older_than_days: int = Query(LOG_RETENTION_DAYS, ge=1),
+):
+    return roll_over(db, older_than_days=older_than_days)
+def _insert_log(db: Session, lg: AccessLog):
+    db.add(lg)
+    db.flush()
+    rollups.record(db, [lg])
+    db.commit()
+    db.refresh(lg)
+    return fmt(lg)
 @router.post("/")
 async def write_log(
     body: LogCreate, 
     request: Request,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     user: User = Depends(get_current_user)
 ):
     lg = AccessLog(
@@ -95,9 +267,7 @@ async def write_log(
         resource=body.resource,
         ip_address=body.ip_address,
     )
-    db.add(lg)
-    db.commit()
-    db.refresh(lg)
+    out = await db.run_sync(_insert_log, lg)
     
     mgr = getattr(request.app.state, 'ws_manager', None)
     if mgr:
@@ -114,4 +284,121 @@ async def write_log(
             "resource": lg.resource,
             "timestamp": lg.timestamp.isoformat()
         })
-    return fmt(lg)
+    return out
+async def _batch_items(request: Request):
+    ctype = request.headers.get("content-type", "")
+    if "ndjson" in ctype or "jsonl" in ctype:
+        idx = 0
+        tail = b""
+        async for chunk in request.stream():
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield idx, line
+                    idx += 1
+        if tail.strip():
+            yield idx, tail
+        return
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="body must be a JSON array or NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="body must be a JSON array or NDJSON")
+    for idx, item in enumerate(items):
+        yield idx, item
+def _lookup(db, cols, key_col, ids, chunk=500):
+    ids = list(ids)
+    found = {}
+    for i in range(0, len(ids), chunk):
+        for row in db.query(*cols).filter(key_col.in_(ids[i:i + chunk])):
+            found[row[0]] = row
+    return found
+@router.post("/batch")
+async def write_batch(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user),
+):
+    now = datetime.utcnow()
+    skew = timedelta(seconds=LOG_CLOCK_SKEW_SECONDS)
+    rows = []
+    errors = []
+    received = 0
+    async for idx, item in _batch_items(request):
+        received += 1
+        if received > LOG_BATCH_MAX:
+            raise HTTPException(status_code=413, detail=f"batch exceeds {LOG_BATCH_MAX} records")
+        try:
+            if isinstance(item, (bytes, str)):
+                item = json.loads(item)
+            if not isinstance(item, dict):
+                raise TypeError("record must be a JSON object")
+            rec = BatchLogCreate(**item)
+        except (ValueError, TypeError) as e:
+            errors.append({"index": idx, "error": error_text(e)})
+            continue
+        uid = rec.user_id if rec.user_id is not None else user.id
+        if uid != user.id and user.role != "admin":
+            errors.append({"index": idx, "error": "user_id: only admins may log on behalf of other users"})
+            continue
+        ts = rec.timestamp or now
+        if ts.tzinfo is not None:
+            ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+        if user.role != "admin":
+            ts = min(max(ts, now - skew), now + skew)
+        rows.append({
+            "index": idx,
+            "user_id": uid,
+            "patient_id": rec.patient_id,
+            "action": rec.action.upper(),
+            "resource": rec.resource,
+            "ip_address": rec.ip_address,
+            "timestamp": ts,
+            "anomaly_score": 0.0,
+            "flagged": 0,
+        })
+    users = await db.run_sync(_lookup, (User.id, User.name, User.role), User.id, {r["user_id"] for r in rows})
+    patients = await db.run_sync(
+        _lookup, (Patient.id, Patient.name, Patient.ward), Patient.id,
+        {r["patient_id"] for r in rows if r["patient_id"] is not None},
+    )
+    valid = []
+    for r in rows:
+        if r["user_id"] not in users:
+            errors.append({"index": r["index"], "error": "user_id: user not found"})
+        elif r["patient_id"] is not None and r["patient_id"] not in patients:
+            errors.append({"index": r["index"], "error": "patient_id: patient not found"})
+        else:
+            valid.append(r)
+    if valid:
+        await db.execute(AccessLog.__table__.insert(), [{k: v for k, v in r.items() if k != "index"} for r in valid])
+        await db.run_sync(rollups.record, valid)
+        await db.commit()
+    errors.sort(key=lambda e: e["index"])
+    mgr = getattr(request.app.state, 'ws_manager', None)
+    if mgr and valid:
+        events = []
+        for r in valid[-LOG_BATCH_BROADCAST_SAMPLE:]:
+            u = users[r["user_id"]]
+            p = patients.get(r["patient_id"])
+            events.append({
+                "event": "patient_action",
+                "log_id": None,
+                "user_id": u.id,
+                "user_name": u.name,
+                "user_role": u.role,
+                "patient_id": r["patient_id"],
+                "patient_name": p.name if p else None,
+                "patient_ward": p.ward if p else None,
+                "action": r["action"],
+                "resource": r["resource"],
+                "timestamp": r["timestamp"].isoformat(),
+            })
+        await mgr.broadcast({
+            "event": "patient_action_batch",
+            "count": len(valid),
+            "events": events,
+        })
+    return {"received": received, "inserted": len(valid), "failed": len(errors), "errors": errors}
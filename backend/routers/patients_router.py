@@ -1,13 +1,27 @@
+import io
+import csv
 import json
+import asyncio
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, false, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
 from typing import Optional, List
-from backend.database import get_db
-from backend.models import Patient, User, AccessLog
+from backend.database import AsyncSessionLocal, get_async_db, get_async_read_db, get_db, get_read_db
+from backend.models import Patient, PatientScheme, User
+from backend import eligibility, schemes
 from backend.deps import get_current_user, require_admin
+from backend.audit_writer import audit_writer
+from backend.ingest import error_text
+from backend.cache import TTLCache
+from backend.scope import key_covers, scope_service
+from backend.search import match_expr, matching_patient_ids
+from backend.versions import etag, matches, not_modified, tag_response, versions
+from backend.config import RISK_SUMMARY_TTL, PATIENT_IMPORT_MAX, PATIENT_IMPORT_BATCH
 router = APIRouter()
+_risk_cache = TTLCache(maxsize=4096, ttl=RISK_SUMMARY_TTL)
 class PatientCreate(BaseModel):
     name: str
     age: int
@@ -17,6 +31,14 @@ class PatientCreate(BaseModel):
     risk_score: Optional[float] = 0.0
     diagnosis: Optional[str] = None
     medical_records: Optional[dict] = {}
+class PatientImport(BaseModel):
+    name: str
+    age: int
+    ward: str
+    assigned_doctor_id: int
+    risk_score: Optional[float] = 0.0
+    diagnosis: Optional[str] = None
+    medical_records: Optional[dict] = {}
 class PatientEdit(BaseModel):
     age: Optional[int] = None
     ward: Optional[str] = None
@@ -24,38 +46,37 @@ class PatientEdit(BaseModel):
     scheme_eligible: Optional[List[str]] = None
     diagnosis: Optional[str] = None
     medical_records: Optional[dict] = None
-def fmt(p: Patient):
-    return {
+def fmt(p: Patient, full=True):
+    out = {
         "id": p.id,
         "name": p.name,
         "age": p.age,
         "ward": p.ward,
         "assigned_doctor_id": p.assigned_doctor_id,
         "assigned_doctor": p.doctor.name if p.doctor else None,
-        "scheme_eligible": json.loads(p.scheme_eligible) if p.scheme_eligible else [],
+        "scheme_eligible": p.scheme_names,
         "risk_score": p.risk_score,
         "diagnosis": p.diagnosis,
-        "medical_records": json.loads(p.medical_records) if p.medical_records else {},
         "created_at": p.created_at,
     }
+    if full:
+        out["medical_records"] = json.loads(p.medical_records) if p.medical_records else {}
+    return out
 async def _log_action(request: Request, db: Session, user: User, patient: Patient, action: str, resource: str):
-    lg = AccessLog(
-        user_id=user.id,
-        patient_id=patient.id,
-        action=action,
-        resource=resource,
-        ip_address=request.client.host if request.client else "unknown",
-        timestamp=datetime.utcnow(),
-        anomaly_score=0.0,
-        flagged=0,
-    )
-    db.add(lg)
-    db.commit()
-    db.refresh(lg)
-    ws_manager = request.app.state.ws_manager
-    await ws_manager.broadcast({
+    ts = datetime.utcnow()
+    row = {
+        "user_id": user.id,
+        "patient_id": patient.id,
+        "action": action,
+        "resource": resource,
+        "ip_address": request.client.host if request.client else "unknown",
+        "timestamp": ts,
+        "anomaly_score": 0.0,
+        "flagged": 0,
+    }
+    event = {
         "event": "patient_action",
-        "log_id": lg.id,
+        "log_id": None,
         "user_id": user.id,
         "user_name": user.name,
         "user_role": user.role,
@@ -64,127 +85,154 @@ async def _log_action(request: Request, db: Session, user: User, patient: Patien
         "patient_ward": patient.ward,
         "action": action,
         "resource": resource,
-        "timestamp": lg.timestamp.isoformat(),
-    })
-    return lg
-@router.get("/risk-summary")
-def risk_summary(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    q = db.query(Patient)
-    if user.role == "doctor":
-        q = q.filter(Patient.assigned_doctor_id == user.id)
-    elif user.role == "nurse":
-        wards = [w.strip() for w in (user.department or "").split(",") if w.strip()]
-        if wards:
-            q = q.filter(Patient.ward.in_(wards))
-        if user.supervising_doctor_id:
-            q = q.filter(Patient.assigned_doctor_id == user.supervising_doctor_id)
-    patients = q.all()
-    if not patients:
+        "timestamp": ts.isoformat(),
+    }
+    return await audit_writer.submit(row, event, request.app.state.ws_manager)
+@scope_service.on_patient_change
+def _invalidate_risk_summary(states):
+    if states is None:
+        _risk_cache.clear()
+    else:
+        _risk_cache.discard_where(lambda key: any(key_covers(key, ward, doc) for ward, doc in states))
+def _state(p: Patient):
+    return (p.ward, p.assigned_doctor_id)
+def _in_scope(db: Session, user: User, pid: int):
+    if not scope_service.for_user(db, user).allows(pid):
+        if db.query(Patient.id).filter(Patient.id == pid).first() is None:
+            raise HTTPException(status_code=404, detail="patient not found")
+        raise HTTPException(status_code=403, detail="access denied")
+    p = db.query(Patient).filter(Patient.id == pid).first()
+    if not p:
+        raise HTTPException(status_code=404, detail="patient not found")
+    return p
+def _load(db: Session, user: User, pid: int):
+    p = _in_scope(db, user, pid)
+    return p, fmt(p)
+def _compute_risk_summary(db: Session, scope):
+    total, avg_risk, low, medium, high = scope.apply(db.query(
+        func.count(Patient.id),
+        func.avg(Patient.risk_score),
+        func.sum(case((Patient.risk_score < 0.35, 1), else_=0)),
+        func.sum(case((and_(Patient.risk_score >= 0.35, Patient.risk_score < 0.65), 1), else_=0)),
+        func.sum(case((Patient.risk_score >= 0.65, 1), else_=0)),
+    )).one()
+    if not total:
         return {"total": 0, "avg_risk": 0, "buckets": {}, "scheme_counts": {}}
-    total = len(patients)
-    avg_risk = round(sum(p.risk_score for p in patients) / total, 3)
-    buckets = {"low": 0, "medium": 0, "high": 0}
-    scheme_counts = {}
-    ward_counts = {}
-    for p in patients:
-        if p.risk_score < 0.35:
-            buckets["low"] += 1
-        elif p.risk_score < 0.65:
-            buckets["medium"] += 1
-        else:
-            buckets["high"] += 1
-        ward_counts[p.ward] = ward_counts.get(p.ward, 0) + 1
-        schemes = json.loads(p.scheme_eligible) if p.scheme_eligible else []
-        for s in schemes:
-            scheme_counts[s] = scheme_counts.get(s, 0) + 1
+    ward_counts = dict(scope.apply(db.query(Patient.ward, func.count(Patient.id))).group_by(Patient.ward).all())
+    scheme_counts = dict(
+        scope.apply(db.query(PatientScheme.scheme_name, func.count()).join(Patient, Patient.id == PatientScheme.patient_id))
+        .group_by(PatientScheme.scheme_name)
+        .all()
+    )
     return {
         "total": total,
-        "avg_risk": avg_risk,
-        "buckets": buckets,
+        "avg_risk": round(avg_risk, 3),
+        "buckets": {"low": low, "medium": medium, "high": high},
         "scheme_counts": scheme_counts,
         "ward_counts": ward_counts,
     }
-def nurse_wards(user: User):
-    if user.role == "nurse" and user.department:
-        return [w.strip() for w in user.department.split(",") if w.strip()]
-    return []
-def can_access_patient(user: User, patient: Patient) -> bool:
-    if user.role == "admin":
-        return True
-    if user.role == "doctor":
-        return patient.assigned_doctor_id == user.id
-    if user.role == "nurse":
-        wards = nurse_wards(user)
-        ward_ok = patient.ward in wards
-        doc_ok = (user.supervising_doctor_id is None or
-                  patient.assigned_doctor_id == user.supervising_doctor_id)
-        return ward_ok and doc_ok
-    return False
+@router.get("/risk-summary")
+def risk_summary(db: Session = Depends(get_read_db), user: User = Depends(get_current_user)):
+    scope = scope_service.for_user(db, user)
+    summary = _risk_cache.get(scope.key)
+    if summary is None:
+        summary = _compute_risk_summary(db, scope)
+        _risk_cache.set(scope.key, summary)
+    return summary
+SORT_COLUMNS = {
+    "name": Patient.name,
+    "risk_score": Patient.risk_score,
+    "age": Patient.age,
+    "created_at": Patient.created_at,
+}
+LIST_COLUMNS = (
+    Patient.id, Patient.name, Patient.age, Patient.ward, Patient.assigned_doctor_id,
+    Patient.risk_score, Patient.diagnosis, Patient.created_at,
+)
+PATIENT_TABLES = ("patients", "patient_schemes", "users")
 @router.get("/")
 def list_patients(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
     user: User = Depends(get_current_user),
-    ward: Optional[str] = None,
+    ward: Optional[List[str]] = Query(None),
     search: Optional[str] = None,
+    diagnosis: Optional[str] = None,
+    scheme: Optional[str] = None,
+    min_risk: Optional[float] = Query(None, ge=0, le=1),
+    max_risk: Optional[float] = Query(None, ge=0, le=1),
+    sort: str = Query("name", pattern="^(name|risk_score|age|created_at)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    fields: str = Query("list", pattern="^(list|full)$"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
 ):
-    q = db.query(Patient)
-    if user.role == "doctor":
-        q = q.filter(Patient.assigned_doctor_id == user.id)
-    elif user.role == "nurse":
-        wards = nurse_wards(user)
-        if wards:
-            q = q.filter(Patient.ward.in_(wards))
-        if user.supervising_doctor_id:
-            q = q.filter(Patient.assigned_doctor_id == user.supervising_doctor_id)
+    scope = scope_service.for_user(db, user)
+    tag = etag("patients", scope.signature, versions(db, *PATIENT_TABLES), sorted(request.query_params.multi_items()))
+    if matches(request, tag):
+        return not_modified(tag)
+    tag_response(response, tag)
+    q = scope.apply(db.query(Patient))
     if ward:
-        q = q.filter(Patient.ward.ilike(f"%{ward}%"))
+        q = q.filter(Patient.ward.in_(ward))
+    if diagnosis:
+        q = q.filter(Patient.diagnosis == diagnosis)
+    if min_risk is not None:
+        q = q.filter(Patient.risk_score >= min_risk)
+    if max_risk is not None:
+        q = q.filter(Patient.risk_score <= max_risk)
+    if scheme:
+        q = q.filter(Patient.id.in_(select(PatientScheme.patient_id).where(PatientScheme.scheme_name == scheme)))
     if search:
-        q = q.filter(Patient.name.ilike(f"%{search}%"))
-    return [fmt(p) for p in q.order_by(Patient.name).all()]
+        expr = match_expr(search)
+        q = q.filter(Patient.id.in_(matching_patient_ids(expr))) if expr else q.filter(false())
+    if limit is not None:
+        response.headers["X-Total-Count"] = str(q.count())
+    col = SORT_COLUMNS[sort]
+    q = q.order_by(col.desc() if order == "desc" else col, Patient.id)
+    if fields == "list":
+        q = q.options(load_only(*LIST_COLUMNS), joinedload(Patient.doctor).load_only(User.name), selectinload(Patient.schemes))
+    else:
+        q = q.options(joinedload(Patient.doctor), selectinload(Patient.schemes))
+    if limit is not None:
+        q = q.offset(offset).limit(limit)
+    return [fmt(p, full=fields == "full") for p in q.all()]
 @router.get("/{pid}")
 async def get_patient(
     pid: int,
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db),
     user: User = Depends(get_current_user),
 ):
-    p = db.query(Patient).filter(Patient.id == pid).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="patient not found")
-    if not can_access_patient(user, p):
-        raise HTTPException(status_code=403, detail="access denied")
+    scope = await db.run_sync(scope_service.for_user, user)
+    tag = etag("patient", pid, scope.signature, await db.run_sync(versions, *PATIENT_TABLES))
+    if scope.allows(pid) and matches(request, tag):
+        p = (await db.execute(select(Patient.id, Patient.name, Patient.ward).where(Patient.id == pid))).first()
+        if p:
+            await _log_action(request, db, user, p, "VIEW", "patient_record")
+            return not_modified(tag)
+    p, out = await db.run_sync(_load, user, pid)
+    tag_response(response, tag)
     await _log_action(request, db, user, p, "VIEW", "patient_record")
-    return fmt(p)
+    return out
 @router.post("/{pid}/export")
 async def export_patient(
     pid: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     user: User = Depends(get_current_user),
 ):
-    p = db.query(Patient).filter(Patient.id == pid).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="patient not found")
-    if not can_access_patient(user, p):
-        raise HTTPException(status_code=403, detail="access denied")
+    p, out = await db.run_sync(_load, user, pid)
     await _log_action(request, db, user, p, "EXPORT", "patient_record")
-    return fmt(p)
-@router.patch("/{pid}")
-async def edit_patient(
-    pid: int,
-    body: PatientEdit,
-    request: Request,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
-):
-    p = db.query(Patient).filter(Patient.id == pid).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="patient not found")
-    if not can_access_patient(user, p):
-        raise HTTPException(status_code=403, detail="access denied")
+    return out
+def _edit(db: Session, user: User, pid: int, body: PatientEdit):
+    p = _in_scope(db, user, pid)
     if user.role == "nurse":
         if body.ward is not None or body.risk_score is not None or body.scheme_eligible is not None:
             raise HTTPException(status_code=403, detail="Nurses are not allowed to edit ward, risk score, or scheme eligibility")
+    before = _state(p)
     if body.age is not None:
         p.age = body.age
     if body.ward is not None:
@@ -192,15 +240,26 @@ async def edit_patient(
     if body.risk_score is not None:
         p.risk_score = body.risk_score
     if body.scheme_eligible is not None:
-        p.scheme_eligible = json.dumps(body.scheme_eligible)
+        schemes.assign(db, p, body.scheme_eligible)
     if body.diagnosis is not None:
         p.diagnosis = body.diagnosis
     if body.medical_records is not None:
         p.medical_records = json.dumps(body.medical_records)
     db.commit()
     db.refresh(p)
+    return p, before, fmt(p)
+@router.patch("/{pid}")
+async def edit_patient(
+    pid: int,
+    body: PatientEdit,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user),
+):
+    p, before, out = await db.run_sync(_edit, user, pid, body)
+    scope_service.patients_changed(before, _state(p))
     await _log_action(request, db, user, p, "EDIT", "patient_record")
-    return fmt(p)
+    return out
 @router.post("/")
 def create_patient(body: PatientCreate, db: Session = Depends(get_db), _: User = Depends(require_admin)):
     doctor = db.query(User).filter(User.id == body.assigned_doctor_id, User.role == "doctor").first()
@@ -211,30 +270,116 @@ def create_patient(body: PatientCreate, db: Session = Depends(get_db), _: User =
         age=body.age,
         ward=body.ward,
         assigned_doctor_id=body.assigned_doctor_id,
-        scheme_eligible=json.dumps(body.scheme_eligible),
         risk_score=body.risk_score,
         diagnosis=body.diagnosis,
         medical_records=json.dumps(body.medical_records or {}),
     )
+    schemes.assign(db, p, body.scheme_eligible or [])
     db.add(p)
     db.commit()
     db.refresh(p)
+    scope_service.patients_changed(_state(p))
     return fmt(p)
+def _import_records(raw: bytes, ctype: str):
+    text = raw.decode("utf-8-sig")
+    if "csv" in ctype:
+        for idx, rec in enumerate(csv.DictReader(io.StringIO(text))):
+            rec = {k: v for k, v in rec.items() if k and v not in ("", None)}
+            if "medical_records" in rec:
+                try:
+                    rec["medical_records"] = json.loads(rec["medical_records"])
+                except ValueError as e:
+                    yield idx, e
+                    continue
+            yield idx, rec
+        return
+    idx = 0
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield idx, json.loads(line)
+        except ValueError as e:
+            yield idx, e
+        idx += 1
+def _plan_import(db: Session, valid, errors):
+    doctor_ids = {r.assigned_doctor_id for _, r in valid}
+    doctors = {
+        uid for (uid,) in db.query(User.id).filter(User.role == "doctor", User.id.in_(doctor_ids))
+    } if doctor_ids else set()
+    rows = []
+    for idx, r in valid:
+        if r.assigned_doctor_id not in doctors:
+            errors.append({"index": idx, "error": "assigned_doctor_id: assigned doctor not found"})
+        else:
+            rows.append(r)
+    return rows, eligibility.get_engine(db).evaluate_many([r.age for r in rows]), schemes.scheme_ids(db)
+def _store_import(db: Session, rows, eligible, ids):
+    now = datetime.utcnow()
+    for i in range(0, len(rows), PATIENT_IMPORT_BATCH):
+        chunk = rows[i:i + PATIENT_IMPORT_BATCH]
+        pids = db.execute(
+            insert(Patient).returning(Patient.id, sort_by_parameter_order=True),
+            [{
+                "name": r.name,
+                "age": r.age,
+                "ward": r.ward,
+                "assigned_doctor_id": r.assigned_doctor_id,
+                "risk_score": r.risk_score,
+                "diagnosis": r.diagnosis,
+                "medical_records": json.dumps(r.medical_records or {}),
+                "created_at": now,
+            } for r in chunk],
+        ).scalars().all()
+        links = [
+            {"patient_id": pid, "scheme_name": name, "scheme_id": ids.get(name)}
+            for pid, names in zip(pids, eligible[i:i + PATIENT_IMPORT_BATCH])
+            for name in names
+        ]
+        if links:
+            db.execute(insert(PatientScheme), links)
+        db.commit()
+def _validate_import(raw: bytes, ctype: str):
+    valid = []
+    errors = []
+    received = 0
+    for idx, rec in _import_records(raw, ctype):
+        received += 1
+        if received > PATIENT_IMPORT_MAX:
+            raise HTTPException(status_code=413, detail=f"import exceeds {PATIENT_IMPORT_MAX} rows")
+        try:
+            if isinstance(rec, Exception):
+                raise rec
+            if not isinstance(rec, dict):
+                raise TypeError("row must be a JSON object")
+            valid.append((idx, PatientImport(**rec)))
+        except (ValueError, TypeError) as e:
+            errors.append({"index": idx, "error": error_text(e)})
+    return received, valid, errors
+@router.post("/import")
+async def import_patients(request: Request, db: AsyncSession = Depends(get_async_read_db), _: User = Depends(require_admin)):
+    raw = await request.body()
+    received, valid, errors = await asyncio.to_thread(_validate_import, raw, request.headers.get("content-type", ""))
+    rows, eligible, ids = await db.run_sync(_plan_import, valid, errors)
+    if rows:
+        async with AsyncSessionLocal() as w:
+            await w.run_sync(_store_import, rows, eligible, ids)
+        scope_service.patients_changed(*{(r.ward, r.assigned_doctor_id) for r in rows})
+    errors.sort(key=lambda e: e["index"])
+    return {"received": received, "inserted": len(rows), "failed": len(errors), "errors": errors}
 @router.delete("/{pid}")
 async def delete_patient(
     pid: int,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    p = db.query(Patient).filter(Patient.id == pid).first()
-    if not p:
-        raise HTTPException(status_code=404, detail="patient not found")
-    if not can_access_patient(user, p):
-        raise HTTPException(status_code=403, detail="access denied")
+    p = await db.run_sync(_in_scope, user, pid)
     if user.role == "nurse":
          raise HTTPException(status_code=403, detail="Nurses are not allowed to delete patient records")
     await _log_action(request, db, user, p, "DELETE", "patient_record")
-    db.delete(p)
-    db.commit()
+    state = _state(p)
+    await db.delete(p)
+    await db.commit()
+    scope_service.patients_changed(state)
     return {"detail": "patient deleted"}
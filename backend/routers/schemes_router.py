@@ -0,0 +1,97 @@
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from backend.database import get_db, get_read_db
+from backend.models import PatientScheme, SchemeMapping, User
+from backend.deps import require_admin
+from backend.config import HOSPITAL_STATE
+from backend.scope import scope_service
+from backend import eligibility
+router = APIRouter()
+class SchemeCreate(BaseModel):
+    scheme_name: str
+    state: str = "ALL"
+    eligibility_criteria: dict = {}
+    benefit_amount: float = 0.0
+class SchemeEdit(BaseModel):
+    scheme_name: Optional[str] = None
+    state: Optional[str] = None
+    eligibility_criteria: Optional[dict] = None
+    benefit_amount: Optional[float] = None
+def fmt(s: SchemeMapping):
+    return {
+        "id": s.id,
+        "scheme_name": s.scheme_name,
+        "state": s.state,
+        "eligibility_criteria": json.loads(s.eligibility_criteria) if s.eligibility_criteria else {},
+        "benefit_amount": s.benefit_amount,
+    }
+def _criteria(c):
+    try:
+        lo = int(c.get("min_age", 0))
+        hi = int(c.get("max_age", 999))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="min_age and max_age must be integers")
+    if lo > hi:
+        raise HTTPException(status_code=422, detail="min_age must not exceed max_age")
+    return json.dumps(c)
+def _range(s: SchemeMapping):
+    r = eligibility.Rule(s.id, s.scheme_name, s.state, s.eligibility_criteria)
+    return [(r.min_age, r.max_age)] if r.applies_to(HOSPITAL_STATE) else []
+def _recompute(db, ranges, names=()):
+    eligibility.invalidate()
+    changed, states = eligibility.recompute(db, ranges, names)
+    if states:
+        scope_service.patients_changed(*states)
+    return changed
+@router.get("/")
+def list_schemes(db: Session = Depends(get_read_db), _: User = Depends(require_admin)):
+    return [fmt(s) for s in db.query(SchemeMapping).order_by(SchemeMapping.id)]
+@router.post("/")
+def create_scheme(body: SchemeCreate, db: Session = Depends(get_db), _: User = Depends(require_admin)):
+    s = SchemeMapping(
+        scheme_name=body.scheme_name,
+        state=body.state,
+        eligibility_criteria=_criteria(body.eligibility_criteria),
+        benefit_amount=body.benefit_amount,
+    )
+    db.add(s)
+    db.commit()
+    db.refresh(s)
+    changed = _recompute(db, _range(s))
+    return {**fmt(s), "patients_updated": changed}
+@router.patch("/{sid}")
+def edit_scheme(sid: int, body: SchemeEdit, db: Session = Depends(get_db), _: User = Depends(require_admin)):
+    s = db.query(SchemeMapping).filter(SchemeMapping.id == sid).first()
+    if not s:
+        raise HTTPException(status_code=404, detail="scheme not found")
+    criteria = _criteria(body.eligibility_criteria) if body.eligibility_criteria is not None else None
+    old_name = s.scheme_name
+    ranges = _range(s)
+    if body.scheme_name is not None:
+        s.scheme_name = body.scheme_name
+    if body.state is not None:
+        s.state = body.state
+    if criteria is not None:
+        s.eligibility_criteria = criteria
+    if body.benefit_amount is not None:
+        s.benefit_amount = body.benefit_amount
+    db.commit()
+    changed = _recompute(db, ranges + _range(s), [old_name])
+    return {**fmt(s), "patients_updated": changed}
+@router.delete("/{sid}")
+def delete_scheme(sid: int, db: Session = Depends(get_db), _: User = Depends(require_admin)):
+    s = db.query(SchemeMapping).filter(SchemeMapping.id == sid).first()
+    if not s:
+        raise HTTPException(status_code=404, detail="scheme not found")
+    name = s.scheme_name
+    ranges = _range(s)
+    db.query(PatientScheme).filter(PatientScheme.scheme_id == sid).update(
+        {PatientScheme.scheme_id: None}, synchronize_session=False
+    )
+    db.delete(s)
+    db.commit()
+    changed = _recompute(db, ranges, [name])
+    return {"id": sid, "deleted": True, "patients_updated": changed}
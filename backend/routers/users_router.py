@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional
-from backend.database import get_db
+from backend.database import get_db, get_read_db
 from backend.models import User
 from backend.auth import hash_password
 from backend.deps import require_admin
+from backend.principals import principals
+from backend.scope import scope_service
+from backend.versions import etag, matches, not_modified, tag_response, versions
 router = APIRouter()
 class UserCreate(BaseModel):
     name: str
@@ -26,7 +29,11 @@ def fmt(u: User):
         "created_at": u.created_at,
     }
 @router.get("/")
-def list_users(db: Session = Depends(get_db), _: User = Depends(require_admin)):
+def list_users(request: Request, response: Response, db: Session = Depends(get_read_db), _: User = Depends(require_admin)):
+    tag = etag("users", versions(db, "users"))
+    if matches(request, tag):
+        return not_modified(tag)
+    tag_response(response, tag)
     return [fmt(u) for u in db.query(User).all()]
 @router.post("/")
 def create_user(body: UserCreate, db: Session = Depends(get_db), _: User = Depends(require_admin)):
@@ -51,6 +58,7 @@ def toggle_lock(uid: int, body: LockToggle, db: Session = Depends(get_db), _: Us
         raise HTTPException(status_code=404, detail="user not found")
     u.is_locked = body.is_locked
     db.commit()
+    principals.invalidate(uid)
     return {"id": u.id, "is_locked": u.is_locked}
 @router.delete("/{uid}")
 def delete_user(uid: int, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
@@ -61,4 +69,6 @@ def delete_user(uid: int, db: Session = Depends(get_db), admin: User = Depends(r
         raise HTTPException(status_code=404, detail="user not found")
     db.delete(u)
     db.commit()
+    principals.invalidate(uid)
+    scope_service.clear()
     return {"deleted": uid}
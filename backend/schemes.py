@@ -0,0 +1,15 @@
+from backend.models import PatientScheme, SchemeMapping
+from backend.config import HOSPITAL_STATE
+def scheme_ids(db, state=HOSPITAL_STATE):
+    rows = db.query(SchemeMapping.id, SchemeMapping.scheme_name, SchemeMapping.state).order_by(SchemeMapping.id).all()
+    ids = {}
+    for sid, name, st in rows:
+        if st in ("ALL", state):
+            ids.setdefault(name, sid)
+    for sid, name, _ in rows:
+        ids.setdefault(name, sid)
+    return ids
+def scheme_links(names, ids):
+    return [PatientScheme(scheme_name=n, scheme_id=ids.get(n)) for n in sorted(set(names))]
+def assign(db, patient, names, ids=None):
+    patient.schemes = scheme_links(names, ids if ids is not None else scheme_ids(db))
@@ -0,0 +1,91 @@
+from sqlalchemy import and_, false
+from backend.models import Patient
+from backend.cache import SharedEpoch, TTLCache
+from backend.config import SCOPE_TTL, SCOPE_EPOCH_FILE
+def nurse_wards(user):
+    if user.role == "nurse" and user.department:
+        return [w.strip() for w in user.department.split(",") if w.strip()]
+    return []
+def scope_key(user):
+    if user.role == "admin":
+        return ("admin",)
+    if user.role == "doctor":
+        return ("doctor", user.id)
+    if user.role == "nurse":
+        return ("nurse", tuple(sorted(nurse_wards(user))), user.supervising_doctor_id)
+    return ("none", user.id)
+def key_covers(key, ward, doctor_id):
+    if key[0] == "admin":
+        return True
+    if key[0] == "doctor":
+        return key[1] == doctor_id
+    if key[0] == "nurse":
+        return ward in key[1] and (key[2] is None or key[2] == doctor_id)
+    return False
+def key_clause(key):
+    if key[0] == "admin":
+        return None
+    if key[0] == "doctor":
+        return Patient.assigned_doctor_id == key[1]
+    if key[0] == "nurse" and key[1]:
+        clause = Patient.ward.in_(key[1])
+        if key[2] is not None:
+            clause = and_(clause, Patient.assigned_doctor_id == key[2])
+        return clause
+    return false()
+class Scope:
+    def __init__(self, key, patient_ids):
+        self.key = key
+        self.role = key[0]
+        self.patient_ids = patient_ids
+        self.signature = ":".join(",".join(p) if isinstance(p, tuple) else str(p) for p in key)
+    def allows(self, pid):
+        return self.patient_ids is None or pid in self.patient_ids
+    def covers(self, ward, doctor_id):
+        return key_covers(self.key, ward, doctor_id)
+    def version_names(self):
+        if self.role == "doctor":
+            return (f"doctor:{self.key[1]}",)
+        if self.role == "nurse":
+            return tuple(f"ward:{w}" for w in self.key[1])
+        return ()
+    def clause(self):
+        return key_clause(self.key)
+    def apply(self, q):
+        clause = key_clause(self.key)
+        return q if clause is None else q.filter(clause)
+class ScopeService:
+    def __init__(self, ttl=SCOPE_TTL, epoch_file=SCOPE_EPOCH_FILE):
+        self._scopes = TTLCache(maxsize=4096, ttl=ttl)
+        self._listeners = []
+        self._epoch = SharedEpoch(epoch_file)
+    def for_user(self, db, user):
+        if self._epoch.changed():
+            self._drop()
+        key = scope_key(user)
+        scope = self._scopes.get(key)
+        if scope is None:
+            scope = self._build(db, key)
+            self._scopes.set(key, scope)
+        return scope
+    def _build(self, db, key):
+        if key[0] == "admin":
+            return Scope(key, None)
+        ids = db.query(Patient.id).filter(key_clause(key))
+        return Scope(key, frozenset(pid for (pid,) in ids))
+    def on_patient_change(self, fn):
+        self._listeners.append(fn)
+        return fn
+    def patients_changed(self, *states):
+        self._scopes.discard_where(lambda key: any(key_covers(key, ward, doc) for ward, doc in states))
+        for fn in self._listeners:
+            fn(states)
+        self._epoch.bump()
+    def _drop(self):
+        self._scopes.clear()
+        for fn in self._listeners:
+            fn(None)
+    def clear(self):
+        self._drop()
+        self._epoch.bump()
+scope_service = ScopeService()
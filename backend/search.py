@@ -0,0 +1,28 @@
+import re
+from sqlalchemy import column, text
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts USING fts5("
+    "name, diagnosis, content='patients', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_ai AFTER INSERT ON patients BEGIN "
+    "INSERT INTO patients_fts(rowid, name, diagnosis) VALUES (new.id, new.name, new.diagnosis); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_ad AFTER DELETE ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, diagnosis) VALUES ('delete', old.id, old.name, old.diagnosis); END",
+    "CREATE TRIGGER IF NOT EXISTS patients_fts_au AFTER UPDATE OF name, diagnosis ON patients BEGIN "
+    "INSERT INTO patients_fts(patients_fts, rowid, name, diagnosis) VALUES ('delete', old.id, old.name, old.diagnosis); "
+    "INSERT INTO patients_fts(rowid, name, diagnosis) VALUES (new.id, new.name, new.diagnosis); END",
+]
+def ensure_fts(conn):
+    existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patients_fts'")).first()
+    for stmt in FTS_DDL:
+        conn.execute(text(stmt))
+    if not existed:
+        conn.execute(text("INSERT INTO patients_fts(patients_fts) VALUES ('rebuild')"))
+def match_expr(term):
+    tokens = re.findall(r"\w+", term.lower())
+    return " ".join(f'"{t}"*' for t in tokens) or None
+def matching_patient_ids(expr):
+    return (
+        text("SELECT rowid FROM patients_fts WHERE patients_fts MATCH :fts")
+        .bindparams(fts=expr)
+        .columns(column("rowid"))
+    )
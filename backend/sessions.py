@@ -0,0 +1,23 @@
+from datetime import timedelta
+from backend.models import AccessLog
+from backend.config import SESSION_WINDOW_MINUTES, SESSION_RING_SIZE
+LOCAL_IPS = ("unknown", "127.0.0.1", "::1", "localhost")
+class SessionTracker:
+    def __init__(self, window_minutes=SESSION_WINDOW_MINUTES, ring_size=SESSION_RING_SIZE):
+        self.window = timedelta(minutes=window_minutes)
+        self.ring_size = ring_size
+    def record(self, db, entry):
+        # call after flushing entry: the open write transaction orders concurrent logins across workers
+        recent = (
+            db.query(AccessLog.ip_address)
+            .filter(
+                AccessLog.user_id == entry.user_id,
+                AccessLog.timestamp >= entry.timestamp - self.window,
+                AccessLog.action == "LOGIN",
+                AccessLog.id != entry.id,
+            )
+            .order_by(AccessLog.timestamp.desc())
+            .limit(self.ring_size)
+        )
+        return next((ip for (ip,) in recent if ip != entry.ip_address and ip not in LOCAL_IPS), None)
+session_tracker = SessionTracker()
@@ -0,0 +1,70 @@
+import hashlib
+from fastapi import Response
+from sqlalchemy import bindparam, text
+VERSIONED = ("patients", "patient_schemes", "users", "alerts")
+VERSION_DDL = [
+    "CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)",
+] + [
+    f"CREATE TRIGGER IF NOT EXISTS {t}_version_{suffix} AFTER {op} ON {t} BEGIN "
+    f"UPDATE table_versions SET version = version + 1 WHERE name = '{t}'; END"
+    for t in VERSIONED
+    for suffix, op in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+]
+_BUMP = " ON CONFLICT(name) DO UPDATE SET version = version + 1;"
+def _bump_scope(row):
+    return (
+        f"INSERT INTO scope_versions (name, version) VALUES "
+        f"('ward:' || coalesce({row}.ward, ''), 1), ('doctor:' || coalesce({row}.assigned_doctor_id, ''), 1)" + _BUMP
+    )
+def _bump_patient_scope(row):
+    return (
+        "INSERT INTO scope_versions (name, version) "
+        f"SELECT 'ward:' || coalesce(ward, ''), 1 FROM patients WHERE id = {row}.patient_id" + _BUMP +
+        " INSERT INTO scope_versions (name, version) "
+        f"SELECT 'doctor:' || coalesce(assigned_doctor_id, ''), 1 FROM patients WHERE id = {row}.patient_id" + _BUMP
+    )
+VERSION_DDL += [
+    "CREATE TABLE IF NOT EXISTS scope_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)",
+    f"CREATE TRIGGER IF NOT EXISTS patients_scope_ai AFTER INSERT ON patients BEGIN {_bump_scope('new')} END",
+    f"CREATE TRIGGER IF NOT EXISTS patients_scope_au AFTER UPDATE ON patients BEGIN {_bump_scope('old')} {_bump_scope('new')} END",
+    f"CREATE TRIGGER IF NOT EXISTS patients_scope_ad AFTER DELETE ON patients BEGIN {_bump_scope('old')} END",
+    f"CREATE TRIGGER IF NOT EXISTS patient_schemes_scope_ai AFTER INSERT ON patient_schemes BEGIN {_bump_patient_scope('new')} END",
+    f"CREATE TRIGGER IF NOT EXISTS patient_schemes_scope_au AFTER UPDATE ON patient_schemes BEGIN {_bump_patient_scope('new')} END",
+    f"CREATE TRIGGER IF NOT EXISTS patient_schemes_scope_ad AFTER DELETE ON patient_schemes BEGIN {_bump_patient_scope('old')} END",
+]
+def ensure_versions(conn):
+    for stmt in VERSION_DDL:
+        conn.execute(text(stmt))
+    for t in VERSIONED:
+        conn.execute(text("INSERT OR IGNORE INTO table_versions (name, version) VALUES (:t, 0)"), {"t": t})
+_VERSIONS_SQL = text("SELECT name, version FROM table_versions WHERE name IN :names").bindparams(
+    bindparam("names", expanding=True)
+)
+def versions(db, *tables):
+    rows = dict(db.execute(_VERSIONS_SQL, {"names": list(tables)}).all())
+    return tuple(rows.get(t, 0) for t in tables)
+_SCOPE_VERSIONS_SQL = text("SELECT name, version FROM scope_versions WHERE name IN :names").bindparams(
+    bindparam("names", expanding=True)
+)
+def scope_versions(db, names):
+    if not names:
+        return ()
+    rows = dict(db.execute(_SCOPE_VERSIONS_SQL, {"names": list(names)}).all())
+    return tuple(rows.get(n, 0) for n in names)
+def etag(*parts):
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+def matches(request, tag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return tag in (t.strip().removeprefix("W/") for t in header.split(","))
+def tag_response(response, tag):
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "Authorization"
+def not_modified(tag):
+    r = Response(status_code=304)
+    tag_response(r, tag)
+    return r
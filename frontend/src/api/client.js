@@ -21,3 +21,43 @@ api.interceptors.response.use(
     }
 )
 export default api
+export async function streamPost(path, body, onEvent, signal) {
+    const tok = localStorage.getItem('securehealth_token')
+    const res = await fetch(`/api${path}`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            Accept: 'text/event-stream',
+            ...(tok ? { Authorization: `Bearer ${tok}` } : {}),
+        },
+        body: JSON.stringify(body),
+        signal,
+    })
+    if (res.status === 401) {
+        localStorage.removeItem('securehealth_token')
+        localStorage.removeItem('securehealth_user')
+        window.location.href = '/'
+        return
+    }
+    if (!res.ok || !res.body) throw new Error(`stream failed: ${res.status}`)
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let buf = ''
+    while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buf += decoder.decode(value, { stream: true })
+        let idx
+        while ((idx = buf.indexOf('\n\n')) !== -1) {
+            const frame = buf.slice(0, idx)
+            buf = buf.slice(idx + 2)
+            let event = 'message'
+            let data = ''
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim()
+                else if (line.startsWith('data:')) data += line.slice(5).trim()
+            }
+            if (data) onEvent(event, JSON.parse(data))
+        }
+    }
+}
@@ -43,7 +43,8 @@ export default function QueryChat({ messages = [], onSend, loading = false }) {
                             )}
                             {m.role === 'agent' ? (
                                 <div className="prose prose-invert prose-sm max-w-none prose-p:leading-relaxed prose-pre:bg-slate-800 prose-pre:border prose-pre:border-slate-700 marker:text-indigo-400">
-                                    <ReactMarkdown>{m.text}</ReactMarkdown>
+                                    <ReactMarkdown>{m.text || '…'}</ReactMarkdown>
+                                    {m.streaming && <span className="inline-block w-2 h-4 bg-indigo-400 animate-pulse align-middle" />}
                                 </div>
                             ) : (
                                 m.text
@@ -51,7 +52,7 @@ export default function QueryChat({ messages = [], onSend, loading = false }) {
                         </div>
                     </div>
                 ))}
-                {loading && (
+                {loading && !messages[messages.length - 1]?.streaming && (
                     <div className="flex justify-start">
                         <div className="bg-slate-700 border border-slate-600 text-slate-400 text-sm px-4 py-3 rounded-2xl rounded-bl-sm">
                             <span className="animate-pulse">Agent is thinking…</span>
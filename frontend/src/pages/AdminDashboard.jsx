@@ -67,6 +67,10 @@ export default function AdminDashboard() {
             setActivityFeed((prev) => [msg, ...prev].slice(0, 50))
             setTodayLogs((n) => n + 1)
         }
+        if (msg.event === 'patient_action_batch') {
+            setActivityFeed((prev) => [...[...msg.events].reverse(), ...prev].slice(0, 50))
+            setTodayLogs((n) => n + msg.count)
+        }
     }, [])
     const { connected } = useWebSocket(WS_URL, handleWsMessage)
     const handleResolve = async (id) => {
@@ -59,6 +59,9 @@ export default function DoctorDashboard() {
         if (msg.event === 'patient_action') {
             setActivityFeed((prev) => [msg, ...prev].slice(0, 50))
         }
+        if (msg.event === 'patient_action_batch') {
+            setActivityFeed((prev) => [...[...msg.events].reverse(), ...prev].slice(0, 50))
+        }
     }, [])
     const { connected } = useWebSocket(WS_URL, handleWsMessage)
     const wards = [...new Set(patients.map((p) => p.ward))].sort()
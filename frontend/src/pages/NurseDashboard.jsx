@@ -55,18 +55,21 @@ export default function NurseDashboard() {
     }
     useEffect(() => { load() }, [])
     const handleWsMessage = useCallback((msg) => {
+        const visible = (ev) => (
+            (assignedWards.length === 0 || !ev.patient_ward || assignedWards.includes(ev.patient_ward)) &&
+            !(ev.user_role === 'nurse' && ev.user_id !== user.id)
+        )
         if (msg.event === 'patient_action') {
-            if (
-                assignedWards.length === 0 ||
-                !msg.patient_ward ||
-                assignedWards.includes(msg.patient_ward)
-            ) {
-                if (msg.user_role === 'nurse' && msg.user_id !== user.id) {
-                    return
-                }
+            if (visible(msg)) {
                 setActivityFeed((prev) => [msg, ...prev].slice(0, 50))
             }
         }
+        if (msg.event === 'patient_action_batch') {
+            const evs = msg.events.filter(visible).reverse()
+            if (evs.length) {
+                setActivityFeed((prev) => [...evs, ...prev].slice(0, 50))
+            }
+        }
     }, [assignedWards, user.id])
     const { connected } = useWebSocket(WS_URL, handleWsMessage)
     const wards = [...new Set(patients.map((p) => p.ward))].sort()
@@ -1,11 +1,13 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import Navbar from '../components/Navbar'
 import VoiceInput from '../components/VoiceInput'
 import QueryChat from '../components/QueryChat'
-import api from '../api/client'
+import api, { streamPost } from '../api/client'
 export default function PrivacyQueryPage() {
     const [messages, setMessages] = useState([])
     const [loading, setLoading] = useState(false)
+    const abortRef = useRef(null)
+    useEffect(() => () => abortRef.current?.abort(), [])
     useEffect(() => {
         api.get('/agents/commands').then(({ data }) => {
             const history = data
@@ -19,16 +21,28 @@ export default function PrivacyQueryPage() {
             if (history.length > 0) setMessages(history)
         }).catch(() => { })
     }, [])
+    const updateLast = (fn) => setMessages((prev) => [...prev.slice(0, -1), fn(prev[prev.length - 1])])
     const sendQuestion = async (question) => {
-        setMessages((prev) => [...prev, { role: 'user', text: question }])
+        abortRef.current?.abort()
+        const controller = new AbortController()
+        abortRef.current = controller
+        setMessages((prev) => [...prev, { role: 'user', text: question }, { role: 'agent', text: '', streaming: true }])
         setLoading(true)
         try {
-            const { data } = await api.post('/agents/privacy-query/ask', { question })
-            setMessages((prev) => [...prev, { role: 'agent', text: data.answer }])
-        } catch {
-            setMessages((prev) => [...prev, { role: 'agent', text: 'Unable to process — please try again.' }])
+            await streamPost('/agents/privacy-query/ask/stream', { question }, (event, data) => {
+                if (event === 'token') updateLast((m) => ({ ...m, text: m.text + data.text }))
+                else if (event === 'error') updateLast((m) => ({ ...m, text: data.detail }))
+                else if (event === 'done') updateLast((m) => ({ ...m, text: data.answer, streaming: false }))
+            }, controller.signal)
+        } catch (e) {
+            if (e.name !== 'AbortError') {
+                updateLast((m) => ({ ...m, text: m.text || 'Unable to process — please try again.' }))
+            }
         } finally {
-            setLoading(false)
+            if (abortRef.current === controller) {
+                updateLast((m) => ({ ...m, streaming: false }))
+                setLoading(false)
+            }
         }
     }
     return (